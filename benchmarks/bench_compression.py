@@ -0,0 +1,57 @@
+"""
+Build a session archive from a folder of files (e.g. a processed chartpack) under several compression policies,
+and report the build time and archive size of each.
+
+	python -m benchmarks.bench_compression CONFIG FOLDER [--repeat N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from iacta.steps.pack import SessionArchive
+from iacta.types.config import CompressionConfig, CompressionRule, Config
+
+
+def build(folder: str, dst: str, policy: CompressionConfig) -> float:
+	start = time.perf_counter()
+	with SessionArchive(dst, policy) as archive:
+		for dirpath, _, filenames in os.walk(folder):
+			for filename in sorted(filenames):
+				src = os.path.join(dirpath, filename)
+				archive.add_file(src, os.path.relpath(src, folder).replace(os.sep, '/'))
+	return time.perf_counter() - start
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('config', help='path to the configuration file')
+	parser.add_argument('folder', help='folder to archive')
+	parser.add_argument('--repeat', type=int, default=3)
+	args = parser.parse_args()
+
+	config = Config.load_from(args.config)
+
+	policies = {
+		'deflate all': CompressionConfig(default=CompressionRule(method='deflated')),
+		'store all': CompressionConfig(default=CompressionRule(method='stored')),
+		'configured': config.technical.compression,
+		'lzma all': CompressionConfig(default=CompressionRule(method='lzma')),
+	}
+
+	raw_size = sum(
+		os.path.getsize(os.path.join(dirpath, filename))
+		for dirpath, _, filenames in os.walk(args.folder) for filename in filenames
+	)
+	print(f'{args.folder}: {raw_size / 1024 ** 2:.2f} MiB')
+
+	with tempfile.TemporaryDirectory() as tmp:
+		for name, policy in policies.items():
+			dst = os.path.join(tmp, 'session.zip')
+			elapsed = min(build(args.folder, dst, policy) for _ in range(args.repeat))
+			size = os.path.getsize(dst)
+			print(f'{name:>12}: {elapsed * 1000:9.1f} ms, {size / 1024 ** 2:8.2f} MiB ({size / max(raw_size, 1):6.1%})')
+
+
+if __name__ == '__main__':
+	main()
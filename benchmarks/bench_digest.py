@@ -0,0 +1,81 @@
+"""
+Compare the block digest against the reference per-character djb2 loop: check the results are identical, then time both.
+
+	python -m benchmarks.bench_digest [--length N] [--count N] [--repeat N]
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from iacta.types.songlist import digest
+
+
+SALTS = ('iacta', 'arcaea', '光')
+
+
+def reference_digest(s: str, salts: tuple[str, ...]) -> str:
+	def djb2(s: str):
+		hash_val = 5381
+		for char in s:
+			hash_val = ((hash_val << 5) + hash_val) + ord(char)
+			hash_val &= 0xFFFFFFFF
+		return format(hash_val, '08x')
+
+	block_size = 1024
+	strlen = 32
+
+	parts = []
+	total_blocks = (len(s) + block_size - 1) // block_size
+	for i in range(total_blocks):
+		block = s[i * block_size:(i + 1) * block_size]
+		parts.append(djb2(salts[i % len(salts)] + block))
+
+	checksum = ''.join(parts)
+	while len(checksum) < strlen:
+		checksum = checksum + djb2(checksum)
+
+	return checksum[-strlen:]
+
+
+def random_str(rnd: random.Random, length: int) -> str:
+	ranges = [(0x20, 0x7F), (0x3040, 0x30FF), (0x4E00, 0x9FFF), (0x1F300, 0x1F64F)]
+	chars = []
+	for _ in range(length):
+		lo, hi = rnd.choice(ranges)
+		chars.append(chr(rnd.randrange(lo, hi)))
+	return ''.join(chars)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--length', type=int, default=6000, help='characters per string (a songlist dump is a few thousand)')
+	parser.add_argument('--count', type=int, default=100, help='strings per batch')
+	parser.add_argument('--repeat', type=int, default=5)
+	args = parser.parse_args()
+
+	rnd = random.Random(0)
+	lengths = [0, 1, 1023, 1024, 1025, args.length]
+	strings = [random_str(rnd, n) for n in lengths] + [random_str(rnd, args.length) for _ in range(args.count)]
+
+	expected = [reference_digest(s, SALTS) for s in strings]
+	assert [digest.compute_digest(s, SALTS) for s in strings] == expected, 'single digests differ from the reference'
+	assert digest.compute_digests(strings, SALTS) == expected, 'batched digests differ from the reference'
+	print(f'{len(strings)} digests identical to the reference (NumPy: {"numpy" in sys.modules})')
+
+	batch = strings[len(lengths):]
+	timings = {
+		'reference': lambda: [reference_digest(s, SALTS) for s in batch],
+		'single': lambda: [digest.compute_digest(s, SALTS) for s in batch],
+		'batched': lambda: digest.compute_digests(batch, SALTS),
+	}
+
+	base = None
+	for name, func in timings.items():
+		elapsed = min(timeit.repeat(func, number=1, repeat=args.repeat))
+		base = base or elapsed
+		print(f'{name:>10}: {elapsed * 1000:9.2f} ms for {args.count} x {args.length} chars ({base / elapsed:6.1f}x)')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,71 @@
+"""
+Measure the import time of each entry point with `python -X importtime`, in fresh interpreters,
+and list the heaviest top-level packages each of them pulls in.
+
+	python -m benchmarks.bench_importtime [--repeat N] [--top N] [--budget MS]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+ENTRY_POINTS = {
+	'cli': 'iacta.cli',
+	'cache': 'iacta.cache',
+	'digest': 'iacta.types.songlist.digest',
+	'main': 'main',
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> dict[str, int]:
+	"""
+	Import `module` in a fresh interpreter and return the cumulative import time (us) of every imported module.
+	"""
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=ROOT, capture_output=True, text=True
+	)
+	if result.returncode != 0:
+		raise RuntimeError(f'Failed to import {module}:\n{result.stderr.strip()}')
+
+	times: dict[str, int] = {}
+	for line in result.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		_, cumulative, name = line.removeprefix('import time:').split('|')
+		times[name.strip()] = int(cumulative)
+	return times
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per entry point; the fastest run is kept')
+	parser.add_argument('--top', type=int, default=5, help='heaviest top-level packages to list')
+	parser.add_argument('--budget', type=float, default=200.0, help='import time budget (ms) of lightweight entry points')
+	args = parser.parse_args()
+
+	over_budget = []
+	for label, module in ENTRY_POINTS.items():
+		runs = [import_times(module) for _ in range(args.repeat)]
+		best = min(runs, key=lambda times: times[module])
+		total = best[module] / 1000
+
+		marker = ''
+		if label != 'main' and total > args.budget:
+			marker = ' (over budget)'
+			over_budget.append(label)
+		print(f'{label:>8} ({module}): {total:8.1f} ms{marker}')
+
+		packages = {name: us for name, us in best.items() if '.' not in name and name != module}
+		for name, us in sorted(packages.items(), key=lambda x: x[1], reverse=True)[:args.top]:
+			print(f'{"":>10}{name:<24}{us / 1000:8.1f} ms')
+
+	if over_budget:
+		sys.exit(f'Entry points over the {args.budget:.0f} ms budget: {", ".join(over_budget)}')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,90 @@
+"""
+Time the songlist field validators reading the precomputed validation snapshot against the previous versions,
+which walked `Config.instance` on every call. Optionally time full validations of a songlist file.
+
+	python -m benchmarks.bench_validation CONFIG [--songlist PATH] [--number N]
+"""
+import argparse
+import timeit
+from typing import Any
+
+from iacta.types.config import Config
+from iacta.types.songlist.extmodel import SpSonglistItem
+from iacta.types.songlist.types import ensure_custom_str, ensure_matches_config
+
+
+def reference_matches_config(s: Any, field: str) -> Any:
+	config = Config.instance
+	attr = getattr(config.songlist.fixed_fields, field)
+	if attr is None:
+		return s
+
+	if type(s) is not type(attr) or s != attr:
+		raise ValueError(f'Value should be exactly {attr!r}')
+	return s
+
+def reference_custom_str(s: str) -> str:
+	config = Config.instance
+	max_lines = config.songlist.custom_string_max_lines
+	max_line_length = config.songlist.custom_string_max_line_length
+
+	lines = s.split('\n')
+	if max_lines is not None and len(lines) > max_lines:
+		raise ValueError(f'Custom string could only contain at most {max_lines} rows')
+
+	if max_line_length is not None:
+		for ln, line in enumerate(lines):
+			lenc = sum(1 if ch.isascii() else 2 for ch in line)
+			if lenc > max_line_length:
+				raise ValueError(f'Line #{ln} exceeds the line length limitis of length ({max_line_length}, got {lenc})')
+	return s
+
+def reference_rating_check(rating: int, rating_plus: bool) -> bool:
+	config = Config.instance
+	rts = config.songlist.ratings_with_plus if rating_plus else config.songlist.ratings
+	return rating in rts
+
+def snapshot_rating_check(rating: int, rating_plus: bool) -> bool:
+	snapshot = Config.snapshot
+	return rating in (snapshot.rating_with_plus_set if rating_plus else snapshot.rating_set)
+
+
+def compare(name: str, reference, current, number: int) -> None:
+	before = min(timeit.repeat(reference, number=number, repeat=5))
+	after = min(timeit.repeat(current, number=number, repeat=5))
+	print(f'{name:>16}: {before / number * 1e6:8.3f} us -> {after / number * 1e6:8.3f} us ({before / after:5.2f}x)')
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument('config', help='path to the configuration file')
+	parser.add_argument('--songlist', help='songlist file to validate as a whole')
+	parser.add_argument('--number', type=int, default=100000)
+	args = parser.parse_args()
+
+	config = Config.load_from(args.config)
+	fixed = config.songlist.fixed_fields
+	number = args.number
+
+	designers = ['Designer', '谱面设计\nCharter', 'x' * (config.songlist.custom_string_max_line_length // 2)]
+	for s in designers:
+		assert ensure_custom_str(s) == reference_custom_str(s)
+
+	compare('fixed field', lambda: reference_matches_config(fixed.pack, 'pack'), lambda: ensure_matches_config(fixed.pack, 'pack'), number)
+	compare('custom string', lambda: [reference_custom_str(s) for s in designers], lambda: [ensure_custom_str(s) for s in designers], number)
+	compare('rating', lambda: reference_rating_check(9, True), lambda: snapshot_rating_check(9, True), number)
+
+	if args.songlist:
+		with open(args.songlist, 'r', encoding='utf-8') as f:
+			raw = SpSonglistItem.strip_tail_comma(f.read())
+		number = max(number // 1000, 1)
+		# validated like `Chartpack.load_songlist` does, with the snapshot resolved once per songlist
+		elapsed = min(timeit.repeat(
+			lambda: SpSonglistItem.model_validate_json(raw, context=SpSonglistItem.validation_context()),
+			number=number, repeat=5
+		))
+		print(f'{"songlist":>16}: {elapsed / number * 1e3:8.3f} ms per validation')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,132 @@
+from mortis import AFF, Arc, ArcType
+
+from iacta.types.exceptions.general import MultipleExceptions
+
+
+class AFFContext:
+	"""
+	State of one traversal of an AFF, passed to every rule.
+	"""
+	def __init__(self, aff: AFF, aff_name: str, errors: MultipleExceptions) -> None:
+		self.aff = aff
+		self.aff_name = aff_name
+		self.errors = errors
+
+	def group_name(self, group_index: int) -> str:
+		return self.aff_name + f' [tg #{group_index}]'
+
+	def event_name(self, group_index: int, index: int, event: object) -> str:
+		return self.group_name(group_index) + f' [event #{index}] ({type(event).__name__})'
+
+
+class AFFRule:
+	"""
+	Base class of rules run by `AFFVisitor`.
+	- `visit_event` is only called for events that are instances of one of `event_types`.
+	- `visit_group` is only called if overridden.
+	"""
+	event_types: tuple[type, ...] = ()
+
+	def begin(self, ctx: AFFContext) -> None:
+		pass
+
+	def visit_group(self, ctx: AFFContext, index: int, group) -> None:
+		pass
+
+	def visit_event(self, ctx: AFFContext, group_index: int, index: int, event) -> None:
+		pass
+
+	def end(self, ctx: AFFContext) -> None:
+		pass
+
+
+class AFFVisitor:
+	"""
+	Run a set of `AFFRule`s over AFFs, with a single traversal of the timing groups and their events per AFF.
+	"""
+	def __init__(self, rules: list[AFFRule]) -> None:
+		self.rules = rules
+		self.group_rules = [rule for rule in rules if type(rule).visit_group is not AFFRule.visit_group]
+		self.visits_events = any(rule.event_types for rule in rules)
+		self._dispatch: dict[type, list[AFFRule]] = {}
+
+	def _rules_for(self, event_type: type) -> list[AFFRule]:
+		rules = self._dispatch.get(event_type)
+		if rules is None:
+			rules = [rule for rule in self.rules if issubclass(event_type, rule.event_types)]
+			self._dispatch[event_type] = rules
+		return rules
+
+	def run(self, aff: AFF, aff_name: str, errors: MultipleExceptions) -> None:
+		ctx = AFFContext(aff, aff_name, errors)
+
+		for rule in self.rules:
+			rule.begin(ctx)
+
+		if self.group_rules or self.visits_events:
+			for i, group in enumerate(aff.iter_groups()):
+				for rule in self.group_rules:
+					rule.visit_group(ctx, i, group)
+
+				if not self.visits_events:
+					continue
+				for j, event in enumerate(group.iter_events()):
+					for rule in self._rules_for(type(event)):
+						rule.visit_event(ctx, i, j, event)
+
+		for rule in self.rules:
+			rule.end(ctx)
+
+
+################################################################################################################
+
+class BannedGroupParamsRule(AFFRule):
+	def visit_group(self, ctx: AFFContext, index: int, group) -> None:
+		if group.anglex is not None:
+			ctx.errors.add(ctx.group_name(index), 'Parameter \'anglex\' is banned')
+		if group.angley is not None:
+			ctx.errors.add(ctx.group_name(index), 'Parameter \'angley\' is banned')
+
+
+class BannedArcParamsRule(AFFRule):
+	event_types = (Arc,)
+
+	def visit_event(self, ctx: AFFContext, group_index: int, index: int, event: Arc) -> None:
+		if event.type_ == ArcType.Designant:
+			ctx.errors.add(
+				ctx.event_name(group_index, index, event),
+				f'Parameter value \'{ArcType.Designant}\' for \'type_\' is banned'
+			)
+		if event.smoothness is not None:
+			ctx.errors.add(ctx.event_name(group_index, index, event), f'Parameter \'smoothness\' is banned')
+
+
+class TPDFRangeRule(AFFRule):
+	def __init__(self, mintpdf: float, maxtpdf: float) -> None:
+		self.mintpdf = mintpdf
+		self.maxtpdf = maxtpdf
+
+	def end(self, ctx: AFFContext) -> None:
+		tpdf = ctx.aff.unwrap_tpdf()
+		if tpdf <= self.maxtpdf and tpdf >= self.mintpdf:
+			return
+
+		if tpdf < self.mintpdf:
+			msg = f'TPDF falls under minimum {self.mintpdf} (got {tpdf})'
+		else:
+			msg = f'TPDF exceeds maximum {self.maxtpdf} (got {tpdf})'
+		ctx.errors.add(ctx.aff_name, msg)
+
+
+class HitsoundArcsRule(AFFRule):
+	"""
+	Collect the arcs using custom hitsounds, so that hitsounds can be found and renamed without another traversal.
+	"""
+	event_types = (Arc,)
+
+	def __init__(self) -> None:
+		self.arcs: list[Arc] = []
+
+	def visit_event(self, ctx: AFFContext, group_index: int, index: int, event: Arc) -> None:
+		if event.hitsound is not None and event.hitsound.unwrap() is not None:
+			self.arcs.append(event)
@@ -0,0 +1,393 @@
+import json
+import os
+import struct
+import subprocess
+
+from iacta.logging import dbglogger
+from iacta.materialize import materialize
+from iacta.types.exceptions.file import FFmpegError
+from iacta.utils import dump_if_changed, import_optional
+
+
+class AudioInfo:
+	"""
+	Stream parameters of an audio file, as reported by ffprobe.
+	"""
+	def __init__(self, duration: int, sample_rate: int, channels: int, codec: str) -> None:
+		self.duration = duration
+		self.sample_rate = sample_rate
+		self.channels = channels
+		self.codec = codec
+
+	def __len__(self) -> int:
+		return self.duration
+
+	def __repr__(self) -> str:
+		return (
+			f'{self.__class__.__name__}(duration={self.duration!r}, sample_rate={self.sample_rate!r}, '
+			f'channels={self.channels!r}, codec={self.codec!r})'
+		)
+
+
+def _run_raw(cmd: list[str], input: bytes | None = None) -> bytes:
+	if input is None:
+		result = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True)
+	else:
+		result = subprocess.run(cmd, input=input, capture_output=True)
+
+	if result.returncode != 0:
+		stderr = result.stderr.decode('utf-8', errors='replace').strip()
+		raise FFmpegError(f'{os.path.basename(cmd[0])} exited with code {result.returncode}: {stderr}')
+	return result.stdout
+
+def _run(cmd: list[str]) -> str:
+	return _run_raw(cmd).decode('utf-8', errors='replace')
+
+def _get_encoder_name() -> str:
+	# pydub probes for the binaries when imported, so it is only imported once ffmpeg is needed
+	from pydub.utils import get_encoder_name
+	return get_encoder_name()
+
+def _get_prober_name() -> str:
+	from pydub.utils import get_prober_name
+	return get_prober_name()
+
+def _run_ffmpeg(args: list[str], input: bytes | None = None) -> bytes:
+	return _run_raw([_get_encoder_name(), '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', *args], input)
+
+def _seconds(ms: int) -> str:
+	return f'{ms / 1000:.3f}'
+
+
+_OGG_CAPTURE = b'OggS'
+_OGG_PAGE_HEADER = struct.Struct('<4sBBqIIIB')
+_OGG_MAX_PAGE_SIZE = 27 + 255 + 255 * 255
+
+def probe_ogg(path: str) -> AudioInfo | None:
+	"""
+	Read the duration and stream parameters of an Ogg Vorbis / Opus file from its headers only:
+	the sample rate comes from the identification header, and the length from the granule position of the last page.
+	- Return `None` if the file is not a recognized Ogg stream.
+	"""
+	with open(path, 'rb') as f:
+		head = f.read(_OGG_MAX_PAGE_SIZE)
+		if len(head) < _OGG_PAGE_HEADER.size or not head.startswith(_OGG_CAPTURE):
+			return None
+
+		*_, serial, _, _, nsegs = _OGG_PAGE_HEADER.unpack_from(head)
+		packet_start = _OGG_PAGE_HEADER.size + nsegs
+		packet = head[packet_start:]
+
+		if packet.startswith(b'\x01vorbis') and len(packet) >= 16:
+			codec = 'vorbis'
+			channels = packet[11]
+			(sample_rate,) = struct.unpack_from('<I', packet, 12)
+			granule_rate = sample_rate
+			pre_skip = 0
+		elif packet.startswith(b'OpusHead') and len(packet) >= 16:
+			codec = 'opus'
+			channels = packet[9]
+			(pre_skip,) = struct.unpack_from('<H', packet, 10)
+			# Opus always decodes at 48 kHz, whatever the input rate in the header says
+			sample_rate = granule_rate = 48000
+		else:
+			return None
+		if not granule_rate:
+			return None
+
+		f.seek(0, os.SEEK_END)
+		size = f.tell()
+		f.seek(max(size - _OGG_MAX_PAGE_SIZE, 0))
+		tail = f.read()
+
+	# walk backwards to the last page of this stream that carries a granule position
+	pos = len(tail)
+	while (pos := tail.rfind(_OGG_CAPTURE, 0, pos)) != -1:
+		if pos + _OGG_PAGE_HEADER.size > len(tail):
+			continue
+		_, version, _, granule, page_serial, *_ = _OGG_PAGE_HEADER.unpack_from(tail, pos)
+		if version != 0 or page_serial != serial or granule < 0:
+			continue
+
+		samples = max(granule - pre_skip, 0)
+		return AudioInfo(
+			duration=round(samples * 1000 / granule_rate),
+			sample_rate=sample_rate,
+			channels=channels,
+			codec=codec,
+		)
+	return None
+
+
+_WAV_FORMAT_PCM = 0x0001
+_WAV_FORMAT_IEEE_FLOAT = 0x0003
+_WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+def probe_wav(path: str) -> AudioInfo | None:
+	"""
+	Read the duration and stream parameters of a RIFF WAVE file from its `fmt ` and `data` chunk headers.
+	- Return `None` if the file is not a recognized WAVE file, or if its data size is unknown.
+	"""
+	with open(path, 'rb') as f:
+		riff = f.read(12)
+		if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+			return None
+
+		fmt: bytes | None = None
+		data_size: int | None = None
+		while fmt is None or data_size is None:
+			chunk_header = f.read(8)
+			if len(chunk_header) < 8:
+				return None
+			chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+			if chunk_id == b'fmt ':
+				fmt = f.read(chunk_size)
+				if len(fmt) < 16:
+					return None
+				f.seek(chunk_size % 2, os.SEEK_CUR)
+			elif chunk_id == b'data':
+				if chunk_size == 0xFFFFFFFF:
+					# streamed WAVE files leave the size unknown
+					return None
+				data_size = chunk_size
+				if fmt is None:
+					f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+			else:
+				f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+	format_tag, channels, sample_rate, _, block_align, bits = struct.unpack_from('<HHIIHH', fmt)
+	if format_tag == _WAV_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+		(format_tag,) = struct.unpack_from('<H', fmt, 24)
+	
+	if format_tag == _WAV_FORMAT_PCM:
+		codec = 'pcm_u8' if bits == 8 else f'pcm_s{bits}le'
+	elif format_tag == _WAV_FORMAT_IEEE_FLOAT:
+		codec = f'pcm_f{bits}le'
+	else:
+		codec = f'wav_0x{format_tag:04x}'
+	
+	if not sample_rate or not block_align:
+		return None
+
+	return AudioInfo(
+		duration=round(data_size // block_align * 1000 / sample_rate),
+		sample_rate=sample_rate,
+		channels=channels,
+		codec=codec,
+	)
+
+
+def probe_audio(path: str) -> AudioInfo:
+	"""
+	Get the duration (ms) and the stream parameters of the first audio stream, without decoding it.
+	- Ogg and WAVE files are probed from their headers directly; other formats go through ffprobe.
+	"""
+	for probe in (probe_ogg, probe_wav):
+		info = probe(path)
+		if info is not None:
+			return info
+
+	output = _run([
+		_get_prober_name(), '-v', 'error',
+		'-select_streams', 'a:0',
+		'-show_entries', 'stream=codec_name,sample_rate,channels,duration:format=duration',
+		'-of', 'json', path
+	])
+	info = json.loads(output)
+
+	streams = info.get('streams') or []
+	if not streams:
+		raise FFmpegError(f'No audio stream found in {path}')
+	stream = streams[0]
+
+	duration = stream.get('duration') or info.get('format', {}).get('duration')
+	if duration is None:
+		raise FFmpegError(f'Failed to determine the duration of {path}')
+
+	return AudioInfo(
+		duration=round(float(duration) * 1000),
+		sample_rate=int(stream.get('sample_rate', 0)),
+		channels=int(stream.get('channels', 0)),
+		codec=stream.get('codec_name', ''),
+	)
+
+
+def _replace_with(dst: str, produce) -> None:
+	"""
+	Let `produce(tmp)` write into a temporary sibling of `dst`, then move it over `dst` if their contents differ,
+	so that `dst` may also be the source.
+	"""
+	dump_if_changed(dst, produce)
+
+def transcode_audio(src: str, dst: str, format: str, sample_rate: int, channels: int | None = None) -> None:
+	"""
+	Re-encode `src` into `dst` with the given container format, sample rate and optionally channel count,
+	streaming through ffmpeg.
+	"""
+	channel_args = ['-ac', str(channels)] if channels else []
+	_replace_with(dst, lambda tmp: _run_ffmpeg([
+		'-i', src,
+		'-vn', '-map_metadata', '-1',
+		'-ar', str(sample_rate), *channel_args,
+		'-f', format, tmp
+	]))
+
+def clip_audio(src: str, dst: str, format: str, begin: int, end: int, fade_in: int, fade_out: int) -> None:
+	"""
+	Cut [`begin`, `end`) (ms) out of `src` into `dst` with a seek instead of decoding from the start,
+	applying a fade-in at the beginning and a fade-out at the end.
+	"""
+	duration = end - begin
+	fades = [
+		f'afade=t=in:st=0:d={_seconds(min(fade_in, duration))}',
+		f'afade=t=out:st={_seconds(max(duration - fade_out, 0))}:d={_seconds(min(fade_out, duration))}',
+	]
+	_replace_with(dst, lambda tmp: _run_ffmpeg([
+		'-ss', _seconds(begin), '-t', _seconds(duration),
+		'-i', src,
+		'-vn', '-map_metadata', '-1',
+		'-af', ','.join(fades),
+		'-f', format, tmp
+	]))
+
+
+def get_conformity_problems(info: AudioInfo, codecs: tuple[str, ...], sample_rate: int) -> list[str]:
+	"""
+	List the reasons why an audio stream does not conform to the target codecs and sample rate (at most 2 channels).
+	"""
+	problems: list[str] = []
+	if info.codec not in codecs:
+		problems.append(f'codec {info.codec} not in {codecs}')
+	if info.sample_rate != sample_rate:
+		problems.append(f'sample rate {info.sample_rate} != {sample_rate}')
+	if info.channels > 2:
+		problems.append(f'{info.channels} channels')
+	return problems
+
+def conform_audio(
+	src: str,
+	dst: str,
+	format: str,
+	codecs: tuple[str, ...],
+	sample_rate: int,
+	info: AudioInfo | None = None
+) -> bool:
+	"""
+	Make `dst` a `format` file whose codec is one of `codecs`, at `sample_rate`, with at most 2 channels.
+	- Compliant sources are left untouched (or copied as is if `dst` differs from `src`); only out-of-spec ones are transcoded.
+	- Return whether `src` was transcoded.
+	"""
+	if info is None:
+		info = probe_audio(src)
+
+	problems = get_conformity_problems(info, codecs, sample_rate)
+	if not problems:
+		dbglogger.info(f'Passing through {src}: already {info.codec}, {info.sample_rate} Hz, {info.channels} ch')
+		if os.path.abspath(src) != os.path.abspath(dst):
+			_replace_with(dst, lambda tmp: materialize(src, tmp, hardlink=False))
+		return False
+
+	dbglogger.info(f'Transcoding {src}: {"; ".join(problems)}')
+	transcode_audio(src, dst, format, sample_rate, channels=min(info.channels, 2) or None)
+	return True
+
+
+def _ms_to_frames(ms: int, sample_rate: int) -> int:
+	return ms * sample_rate // 1000
+
+def decode_pcm(src: str, begin: int, end: int, sample_rate: int, channels: int):
+	"""
+	Decode [`begin`, `end`) (ms) of `src` into a float32 NumPy array of shape (frames, channels), seeking to `begin` first.
+	"""
+	np = import_optional('numpy')
+	raw = _run_ffmpeg([
+		'-ss', _seconds(begin), '-t', _seconds(end - begin),
+		'-i', src,
+		'-vn', '-ar', str(sample_rate), '-ac', str(channels),
+		'-f', 'f32le', 'pipe:1'
+	])
+	return np.frombuffer(raw, dtype=np.float32).reshape(-1, channels)
+
+def encode_pcm(samples, dst: str, format: str, sample_rate: int) -> None:
+	"""
+	Encode a float32 array of shape (frames, channels) into `dst`, piping the samples to ffmpeg.
+	"""
+	np = import_optional('numpy')
+	channels = samples.shape[1]
+	data = np.ascontiguousarray(samples, dtype=np.float32).tobytes()
+	_replace_with(dst, lambda tmp: _run_ffmpeg([
+		'-f', 'f32le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0',
+		'-map_metadata', '-1',
+		'-f', format, tmp
+	], data))
+
+def apply_fades(samples, sample_rate: int, fade_in: int, fade_out: int) -> None:
+	"""
+	Apply linear fade-in / fade-out gain ramps (ms) to a float32 array of shape (frames, channels) in place.
+	"""
+	np = import_optional('numpy')
+	frames = len(samples)
+	n_in = min(_ms_to_frames(fade_in, sample_rate), frames)
+	n_out = min(_ms_to_frames(fade_out, sample_rate), frames)
+
+	if n_in:
+		samples[:n_in] *= np.linspace(0.0, 1.0, n_in, dtype=np.float32)[:, np.newaxis]
+	if n_out:
+		samples[frames - n_out:] *= np.linspace(1.0, 0.0, n_out, dtype=np.float32)[:, np.newaxis]
+
+
+def render_previews(
+	src: str,
+	clips: dict[str, tuple[int, int]],
+	format: str,
+	sample_rate: int,
+	channels: int,
+	fade_in: int,
+	fade_out: int
+) -> dict[str, Exception]:
+	"""
+	Render preview clips (destination -> [begin, end) in ms) of the same source, each with a fade-in and a fade-out.
+	- The range covering all clips is decoded once into a shared buffer; clips are sliced from it and faded with
+	vectorized gain ramps, and only the final encoding goes through ffmpeg. Identical ranges are encoded once and copied.
+	- Without NumPy, each clip falls back to a seek-based `clip_audio` pass.
+	- Return the errors by destination.
+	"""
+	np = import_optional('numpy')
+	errors: dict[str, Exception] = {}
+	if not clips:
+		return errors
+
+	if np is None:
+		for dst, (begin, end) in clips.items():
+			try:
+				clip_audio(src, dst, format, begin, end, fade_in, fade_out)
+			except Exception as e:
+				errors[dst] = e
+		return errors
+
+	start = min(begin for begin, _ in clips.values())
+	stop = max(end for _, end in clips.values())
+	try:
+		buffer = decode_pcm(src, start, stop, sample_rate, channels)
+	except Exception as e:
+		return {dst: e for dst in clips}
+
+	rendered: dict[tuple[int, int], str] = {}
+	for dst, (begin, end) in clips.items():
+		try:
+			if (begin, end) in rendered:
+				copied = rendered[(begin, end)]
+				_replace_with(dst, lambda tmp: materialize(copied, tmp, hardlink=False))
+				continue
+
+			lo = _ms_to_frames(begin - start, sample_rate)
+			hi = _ms_to_frames(end - start, sample_rate)
+			clip = buffer[lo:hi].copy()
+			apply_fades(clip, sample_rate, fade_in, fade_out)
+			encode_pcm(clip, dst, format, sample_rate)
+			rendered[(begin, end)] = dst
+		except Exception as e:
+			errors[dst] = e
+	
+	return errors
@@ -0,0 +1,304 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import threading
+from typing import TYPE_CHECKING, Self
+
+from iacta.logging import dbglogger, logger
+from iacta.materialize import materialize_tree
+from iacta.types.config import Config
+
+if TYPE_CHECKING:
+	# imported at first use, so that managing the cache from the command line does not load the processing stack
+	from iacta.types.chartpack import Chartpack, ChartpackState
+
+
+class ChartpackCache:
+	"""
+	Persistent cache of processed chartpacks, keyed by the content hash of the submitted zip file
+	together with a hash of the configuration sections that affect chartpack processing.
+	- Each entry holds the normalized pack folder (`pack/`) and the pickled `ChartpackState` (`state.pickle`).
+	- Sibling stores of other steps (`stores`) live next to the entries, and their files count towards the size bound too.
+	- Entries and store files are evicted in least-recently-used order once the cache grows beyond `technical.cache_max_size`.
+	"""
+	version = 1
+	__instance__ = None
+	_lock = threading.Lock()
+
+	state_name = 'state.pickle'
+	pack_name = 'pack'
+	stores = ('hitsounds', 'foolish_covers')
+	_key_pattern = re.compile(r'[0-9a-f]{32}')
+
+	def __init__(self, root: str, max_size: int) -> None:
+		self.root = root
+		self.max_size = max_size
+		self.config_digest = self.get_config_digest()
+
+		# unzipped folder -> cache key, recorded while unzipping so that `store` can find the entry later
+		self.origins: dict[str, str] = {}
+		# folders restored from an entry, the only ones whose cached state `load_state` may return
+		self.restored: dict[str, str] = {}
+
+		os.makedirs(self.root, exist_ok=True)
+
+	@classmethod
+	def get(cls) -> Self | None:
+		"""
+		Return the cache configured by `paths.cache`, or `None` if caching is disabled.
+		"""
+		config = Config.instance
+		if config.paths.cache is None:
+			return None
+
+		# first used from the unzipping thread pool
+		if cls.__instance__ is None:
+			with cls._lock:
+				if cls.__instance__ is None:
+					cls.__instance__ = cls(config.paths.cache, config.technical.cache_max_size)
+		return cls.__instance__
+
+	@classmethod
+	def get_store_root(cls, name: str) -> str:
+		"""
+		Return the folder of the sibling store `name`.
+		- Under `paths.cache` if configured, where it is bounded and evicted together with the chartpack entries.
+		- Otherwise under `paths.root`, which only keeps it for the run, as the root is cleaned at the start of the next one.
+		"""
+		if name not in cls.stores:
+			raise ValueError(f'Unknown cache store {name!r}')
+		config = Config.instance
+		if config.paths.cache is not None:
+			return os.path.join(config.paths.cache, name)
+		return os.path.join(config.paths.root, f'.{name}')
+
+	@classmethod
+	def get_config_digest(cls) -> str:
+		config = Config.instance
+		relevant = {
+			'version': cls.version,
+			'songlist': config.songlist.model_dump(mode='json'),
+			'chartpack': config.chartpack.model_dump(mode='json'),
+			'digest_salts': config.technical.digest_salts,
+		}
+		raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+		return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+	def get_key(self, zip_path: str) -> str:
+		h = hashlib.sha256()
+		with open(zip_path, 'rb') as f:
+			while chunk := f.read(1 << 20):
+				h.update(chunk)
+		h.update(self.config_digest.encode('ascii'))
+		return h.hexdigest()[:32]
+
+	################################################################################################################
+
+	def _entry_path(self, key: str) -> str:
+		return os.path.join(self.root, key)
+
+	def _state_path(self, key: str) -> str:
+		return os.path.join(self.root, key, self.state_name)
+
+	def is_key(self, name: str) -> bool:
+		return self._key_pattern.fullmatch(name) is not None
+
+	def has(self, key: str) -> bool:
+		return os.path.isfile(self._state_path(key))
+
+	def restore_folder(self, key: str, dst: str) -> bool:
+		"""
+		Restore the cached pack folder of `key` to `dst`. Return whether it was a hit.
+		- `dst` is remembered as coming from `key` either way, so that `store` can find the entry later;
+		`load_state` only finds it after a successful restore.
+		- On failure, nothing is left at `dst`.
+		"""
+		self.origins[dst] = key
+		self.restored.pop(dst, None)
+		if not self.has(key):
+			return False
+
+		src = os.path.join(self._entry_path(key), self.pack_name)
+		try:
+			if os.path.exists(dst):
+				shutil.rmtree(dst)
+			# restored folders are processed again, so they must not share inodes with the entry
+			materialize_tree(src, dst, hardlink=False)
+		except Exception as e:
+			dbglogger.warning(f'Failed to restore cache entry {key} to {dst}: [{type(e).__name__}] {e}')
+			shutil.rmtree(dst, ignore_errors=True)
+			return False
+
+		self.restored[dst] = key
+		self._touch(key)
+		dbglogger.info(f'Restored {dst} from cache entry {key}')
+		return True
+
+	def load_state(self, folder: str) -> 'ChartpackState | None':
+		"""
+		Load the cached state for an unzipped folder restored by `restore_folder`, rooted at `folder`.
+		"""
+		from iacta.types.chartpack import ChartpackState
+
+		key = self.restored.get(folder)
+		if key is None or not self.has(key):
+			return None
+
+		try:
+			with open(self._state_path(key), 'rb') as f:
+				state = pickle.load(f)
+			if not isinstance(state, ChartpackState):
+				raise TypeError(f'Unexpected cached object of type {type(state).__name__}')
+		except Exception as e:
+			dbglogger.warning(f'Failed to load cache entry {key}: [{type(e).__name__}] {e}')
+			return None
+
+		state.root = folder
+		return state
+
+	def store(self, chartpack: 'Chartpack') -> None:
+		"""
+		Store a successfully processed chartpack under the key of the zip file it was unzipped from,
+		then evict old entries if needed.
+		"""
+		from iacta.types.chartpack import ChartpackState
+
+		zip_key = self.origins.get(chartpack.root)
+		if zip_key is None:
+			return
+
+		dst = self._entry_path(zip_key)
+		tmp = f'{dst}.tmp-{os.getpid()}'
+
+		try:
+			if os.path.exists(tmp):
+				shutil.rmtree(tmp)
+			materialize_tree(chartpack.root, os.path.join(tmp, self.pack_name), hardlink=False)
+			with open(os.path.join(tmp, self.state_name), 'wb') as f:
+				pickle.dump(ChartpackState(chartpack), f)
+
+			if os.path.exists(dst):
+				shutil.rmtree(dst)
+			os.replace(tmp, dst)
+		except Exception as e:
+			dbglogger.warning(f'Failed to store cache entry {zip_key}: [{type(e).__name__}] {e}')
+			shutil.rmtree(tmp, ignore_errors=True)
+			return
+
+		self.evict()
+
+	################################################################################################################
+
+	def _touch(self, key: str) -> None:
+		try:
+			os.utime(self._state_path(key))
+		except OSError:
+			pass
+
+	def _entries(self) -> list[tuple[str, float, int]]:
+		"""
+		List all evictable items as (path relative to the root, last used time, size in bytes):
+		complete chartpack entries, and the files of the sibling stores.
+		"""
+		entries: list[tuple[str, float, int]] = []
+		for entry in os.scandir(self.root):
+			if not entry.is_dir():
+				continue
+
+			if entry.name in self.stores:
+				for item in os.scandir(entry.path):
+					if item.is_file():
+						stat = item.stat()
+						entries.append((os.path.join(entry.name, item.name), stat.st_mtime, stat.st_size))
+				continue
+
+			if not self.is_key(entry.name) or not self.has(entry.name):
+				continue
+
+			size = 0
+			for dirpath, _, filenames in os.walk(entry.path):
+				for filename in filenames:
+					size += os.path.getsize(os.path.join(dirpath, filename))
+
+			last_used = os.path.getmtime(self._state_path(entry.name))
+			entries.append((entry.name, last_used, size))
+		return entries
+
+	def evict(self, max_size: int | None = None) -> list[str]:
+		"""
+		Remove least recently used items until the cache is no larger than `max_size`.
+		Return the evicted items, relative to the root.
+		"""
+		if max_size is None:
+			max_size = self.max_size
+
+		entries = sorted(self._entries(), key=lambda x: x[1])
+		total = sum(size for _, _, size in entries)
+
+		evicted: list[str] = []
+		for name, _, size in entries:
+			if total <= max_size:
+				break
+			path = os.path.join(self.root, name)
+			if os.path.isdir(path):
+				shutil.rmtree(path, ignore_errors=True)
+			else:
+				try:
+					os.remove(path)
+				except OSError:
+					continue
+			total -= size
+			evicted.append(name)
+			dbglogger.info(f'Evicted cache item {name} ({size} bytes)')
+		return evicted
+
+	def invalidate(self, keys: list[str] | None = None) -> list[str]:
+		"""
+		Remove the given entries, or every chartpack entry if `keys` is `None`. Return the removed keys.
+		- The sibling stores are left alone: their content does not depend on the submitted zip files.
+		"""
+		if keys is None:
+			keys = [entry.name for entry in os.scandir(self.root) if entry.is_dir() and self.is_key(entry.name)]
+
+		removed: list[str] = []
+		for key in keys:
+			path = self._entry_path(key)
+			if not os.path.exists(path):
+				continue
+			shutil.rmtree(path, ignore_errors=True)
+			removed.append(key)
+		return removed
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(prog='python -m iacta.cache', description='Manage the processed chartpack cache.')
+	parser.add_argument('config', help='path to the configuration file')
+
+	subparsers = parser.add_subparsers(dest='command', required=True)
+	clear_parser = subparsers.add_parser('clear', help='invalidate cached chartpacks')
+	clear_parser.add_argument('zipfiles', nargs='*', help='only invalidate entries of these zip files')
+	subparsers.add_parser('prune', help='evict entries and stored files beyond the configured size limit')
+
+	args = parser.parse_args()
+
+	Config.load_from(args.config)
+	cache = ChartpackCache.get()
+	if cache is None:
+		logger.error('Caching is disabled: \'paths.cache\' is not configured')
+		return
+
+	if args.command == 'clear':
+		keys = [cache.get_key(path) for path in args.zipfiles] if args.zipfiles else None
+		removed = cache.invalidate(keys)
+		logger.info(f'Invalidated {len(removed)} cache entries')
+	elif args.command == 'prune':
+		evicted = cache.evict()
+		logger.info(f'Evicted {len(evicted)} cache items')
+
+
+if __name__ == '__main__':
+	main()
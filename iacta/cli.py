@@ -0,0 +1,73 @@
+import argparse
+import json
+import sys
+
+from iacta.logging import log_error, logger
+from iacta.types.config import Config
+
+
+def lint_config(args: argparse.Namespace) -> int:
+	try:
+		Config.load_from(args.config)
+	except Exception as e:
+		log_error(e, f'Invalid configurations: {args.config}')
+		return 1
+
+	logger.info(f'Configurations are valid: {args.config}')
+	return 0
+
+
+def digest(args: argparse.Namespace) -> int:
+	from iacta.types.songlist.extmodel import SpSonglistItem
+
+	Config.load_from(args.config)
+
+	failed = 0
+	for path in args.songlists:
+		try:
+			with open(path, 'r', encoding='utf-8') as f:
+				raw = SpSonglistItem.strip_tail_comma(f.read())
+
+			data = json.loads(raw)
+			data.setdefault('digest', '')
+			songlist = SpSonglistItem.model_validate(data, context=SpSonglistItem.validation_context(digest_check=False))
+			expected = songlist.get_digest()
+		except Exception as e:
+			log_error(e, f'Failed to compute the digest of {path}')
+			failed += 1
+			continue
+
+		if songlist.digest == expected:
+			logger.info(f'{path}: {expected} (verified)')
+		elif args.check:
+			logger.error(f'{path}: {expected} (mismatch, got {songlist.digest!r})')
+			failed += 1
+		else:
+			logger.info(f'{path}: {expected}')
+
+	return 1 if failed else 0
+
+
+def main() -> None:
+	"""
+	Lightweight commands that only load configurations and songlist models, without the asset processing stack.
+	"""
+	parser = argparse.ArgumentParser(prog='python -m iacta.cli', description='Lightweight iacta commands.')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+
+	lint_parser = subparsers.add_parser('lint-config', help='validate a configuration file')
+	lint_parser.add_argument('config', help='path to the configuration file')
+	lint_parser.set_defaults(func=lint_config)
+
+	digest_parser = subparsers.add_parser('digest', help='compute (and verify) the digests of songlist files')
+	digest_parser.add_argument('config', help='path to the configuration file')
+	digest_parser.add_argument('songlists', nargs='+', help='songlist files, with or without a tail comma')
+	digest_parser.add_argument('--check', action='store_true', help='fail if a songlist carries a wrong digest')
+	digest_parser.set_defaults(func=digest)
+
+	args = parser.parse_args()
+	sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+	main()
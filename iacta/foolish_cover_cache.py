@@ -0,0 +1,71 @@
+import hashlib
+import os
+import threading
+
+from iacta.cache import ChartpackCache
+from iacta.logging import dbglogger
+from iacta.types.config import Config
+from iacta.utils import encode_image, write_if_changed
+
+
+class FoolishCoverCache:
+	"""
+	Cache of foolish covers pre-rendered at every `covers.normalize_to` size, shared by all sessions (and worker processes) of a run.
+	- Entries are keyed by the hash of the source image and the target size.
+	- Stored under `paths.cache` if configured, where entries are kept across runs and evicted with the chartpack cache;
+	otherwise under `paths.root`, which is cleaned at the start of the next run.
+	- A source is decoded at most once per process, to render all of its missing sizes.
+	"""
+	_digests: dict[str, str] = {}
+	_lock = threading.Lock()
+
+	@classmethod
+	def get_root(cls) -> str:
+		return ChartpackCache.get_store_root('foolish_covers')
+
+	@classmethod
+	def _digest(cls, src: str) -> str:
+		src = os.path.abspath(src)
+		with cls._lock:
+			digest = cls._digests.get(src)
+		if digest is None:
+			with open(src, 'rb') as f:
+				digest = hashlib.file_digest(f, 'sha256').hexdigest()
+			with cls._lock:
+				cls._digests[src] = digest
+		return digest
+
+	@classmethod
+	def render(cls, src: str) -> dict[tuple[int, int], str]:
+		"""
+		Return the rendered cover of `src` for every configured size (size -> path), rendering the missing ones.
+		"""
+		from PIL import Image
+
+		config = Config.instance
+		sizes = list(dict.fromkeys(config.chartpack.covers.normalize_to.values()))
+
+		digest = cls._digest(src)
+		root = cls.get_root()
+		entries = {size: os.path.join(root, f'{digest}_{size[0]}x{size[1]}.jpg') for size in sizes}
+
+		missing: list[tuple[int, int]] = []
+		for size, entry in entries.items():
+			try:
+				# used entries are touched to stay recent for eviction
+				os.utime(entry)
+			except FileNotFoundError:
+				missing.append(size)
+		if not missing:
+			return entries
+
+		dbglogger.info(f'Rendering foolish cover {src} at {len(missing)} size(s)')
+		os.makedirs(root, exist_ok=True)
+		with Image.open(src) as img:
+			for size in missing:
+				resized = img.resize(size, Image.Resampling.LANCZOS)
+				converted = resized.convert('RGB')
+				# written atomically, so that concurrent workers rendering the same entry never expose partial files
+				write_if_changed(entries[size], encode_image(converted, 'JPEG'))
+
+		return entries
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import threading
+
+from iacta.audio import AudioInfo, conform_audio, get_conformity_problems, probe_audio
+from iacta.cache import ChartpackCache
+from iacta.logging import dbglogger
+from iacta.materialize import materialize
+from iacta.types.config import Config
+from iacta.utils import dump_if_changed
+
+
+class HitsoundCache:
+	"""
+	Content-addressed cache of normalized hitsounds shared by all chartpacks (and worker processes) of a run.
+	- Entries are keyed by the hash of the source file and the target sample rate.
+	- Stored under `paths.cache` if configured, where entries are kept across runs and evicted with the chartpack cache
+	(used entries are touched to stay recent); otherwise under `paths.root`, which is cleaned at the start of the next run.
+	"""
+	codecs = ('pcm_s16le',)
+	format = 'wav'
+
+	hits: int = 0
+	misses: int = 0
+	_lock = threading.Lock()
+
+	@classmethod
+	def get_root(cls) -> str:
+		return ChartpackCache.get_store_root('hitsounds')
+
+	@classmethod
+	def _count(cls, hit: bool) -> None:
+		with cls._lock:
+			if hit:
+				cls.hits += 1
+			else:
+				cls.misses += 1
+
+	@classmethod
+	def take_stats(cls) -> tuple[int, int]:
+		"""
+		Return (hits, misses) counted so far, and reset the counters.
+		"""
+		with cls._lock:
+			stats = cls.hits, cls.misses
+			cls.hits = cls.misses = 0
+		return stats
+
+	@classmethod
+	def add_stats(cls, stats: tuple[int, int]) -> None:
+		with cls._lock:
+			cls.hits += stats[0]
+			cls.misses += stats[1]
+
+	@classmethod
+	def normalize(cls, path: str, info: AudioInfo | None = None) -> None:
+		"""
+		Normalize the hitsound at `path` in place, reusing a previously normalized copy of the same content if possible.
+		- Hitsounds already in the target format are passed through and not counted.
+		"""
+		config = Config.instance
+		sample_rate = config.chartpack.hitsounds.sampling_rate
+
+		if info is None:
+			info = probe_audio(path)
+		if not get_conformity_problems(info, cls.codecs, sample_rate):
+			conform_audio(path, path, cls.format, cls.codecs, sample_rate, info)
+			return
+
+		with open(path, 'rb') as f:
+			digest = hashlib.file_digest(f, 'sha256').hexdigest()
+		entry = os.path.join(cls.get_root(), f'{digest}_{sample_rate}.{cls.format}')
+
+		if os.path.isfile(entry):
+			try:
+				os.utime(entry)
+				cls._copy(entry, path)
+			except FileNotFoundError:
+				# evicted in the meantime
+				pass
+			else:
+				cls._count(True)
+				dbglogger.info(f'Reusing normalized hitsound {entry} for {path}')
+				return
+
+		cls._count(False)
+		conform_audio(path, path, cls.format, cls.codecs, sample_rate, info)
+		try:
+			os.makedirs(os.path.dirname(entry), exist_ok=True)
+			cls._copy(path, entry)
+		except Exception as e:
+			dbglogger.warning(f'Failed to cache normalized hitsound {path}: [{type(e).__name__}] {e}')
+
+	@classmethod
+	def _copy(cls, src: str, dst: str) -> None:
+		# never expose partial files to concurrent readers, and leave identical files untouched
+		dump_if_changed(dst, lambda tmp: materialize(src, tmp, hardlink=False))
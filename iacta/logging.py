@@ -1,13 +1,17 @@
 import logging
 import os
-
-from tqdm import tqdm
+import sys
 
 class TqdmLoggingHandler(logging.Handler):
 	def emit(self, record):
 		try:
 			msg = self.format(record)
-			tqdm.write(msg, end='\n')
+			# progress bars only exist once tqdm has been imported; until then, write directly like tqdm would
+			tqdm = sys.modules.get('tqdm')
+			if tqdm is not None:
+				tqdm.tqdm.write(msg, end='\n')
+			else:
+				sys.stdout.write(msg + '\n')
 		except Exception:
 			self.handleError(record)
 
@@ -0,0 +1,121 @@
+import errno
+import os
+import shutil
+import threading
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+from iacta.logging import dbglogger
+from iacta.types.config import Config
+from iacta.types.exceptions.general import UnreachableBranch
+
+
+# _IOW(0x94, 9, int) on Linux: share the extents of another file (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+# errors meaning that a strategy is not available between two file systems, rather than that the copy failed
+_UNSUPPORTED = {errno.EXDEV, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM, errno.EMLINK}
+
+
+def _hardlink(src: str, dst: str) -> None:
+	os.link(src, dst)
+
+def _reflink(src: str, dst: str) -> None:
+	if fcntl is None:
+		raise OSError(errno.ENOTSUP, 'Reflinks are not supported on this platform')
+	with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+		fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _copy_file_range(src: str, dst: str) -> None:
+	if not hasattr(os, 'copy_file_range'):
+		raise OSError(errno.ENOTSUP, 'copy_file_range is not supported on this platform')
+	with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+		remaining = os.fstat(fsrc.fileno()).st_size
+		while remaining > 0:
+			copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+			if copied == 0:
+				break
+			remaining -= copied
+
+def _copy(src: str, dst: str) -> None:
+	shutil.copyfile(src, dst)
+
+
+class Materializer:
+	"""
+	Put a file at a destination with the cheapest strategy that works, trying `technical.materialize` in order:
+	- `hardlink`: share the inode; only where neither side is modified in place afterwards.
+	- `reflink`: share the extents copy-on-write through `FICLONE`.
+	- `copy_file_range`: copy inside the kernel.
+	- `copy`: plain copy, always tried last.
+	Strategies found unsupported between two devices are skipped for the rest of the run.
+	Source files are never modified.
+	"""
+	strategies = {
+		'hardlink': _hardlink,
+		'reflink': _reflink,
+		'copy_file_range': _copy_file_range,
+		'copy': _copy,
+	}
+
+	_unsupported: set[tuple[str, int, int]] = set()
+	_lock = threading.Lock()
+
+	@classmethod
+	def get_order(cls, hardlink: bool) -> list[str]:
+		config = Config.instance
+		return [
+			name for name in config.technical.materialize
+			if name != 'copy' and (hardlink or name != 'hardlink')
+		] + ['copy']
+
+	@classmethod
+	def materialize(cls, src: str, dst: str, hardlink: bool = True, preserve_metadata: bool = False) -> str:
+		"""
+		Materialize `src` at `dst`, replacing it. Return the name of the strategy used.
+		- With `preserve_metadata`, copies also get the timestamps and mode of `src` like `shutil.copy2`
+		(hardlinks share them anyway).
+		"""
+		if os.path.lexists(dst):
+			if os.path.exists(dst) and os.path.samefile(src, dst):
+				return 'hardlink'
+			os.remove(dst)
+
+		src_dev = os.stat(src).st_dev
+		dst_dev = os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+
+		for name in cls.get_order(hardlink):
+			key = name, src_dev, dst_dev
+			if name != 'copy' and key in cls._unsupported:
+				continue
+
+			try:
+				cls.strategies[name](src, dst)
+			except OSError as e:
+				if name == 'copy' or e.errno not in _UNSUPPORTED:
+					raise
+				with cls._lock:
+					cls._unsupported.add(key)
+				dbglogger.info(f'Materializing with {name} is unsupported from device {src_dev} to {dst_dev}: {e}')
+				if os.path.lexists(dst):
+					os.remove(dst)
+				continue
+
+			if preserve_metadata and name != 'hardlink':
+				shutil.copystat(src, dst)
+			return name
+
+		raise UnreachableBranch
+
+
+def materialize(src: str, dst: str, hardlink: bool = True, preserve_metadata: bool = False) -> str:
+	return Materializer.materialize(src, dst, hardlink, preserve_metadata)
+
+def materialize_tree(src: str, dst: str, hardlink: bool = True) -> None:
+	"""
+	Like `shutil.copytree`, with every file materialized.
+	"""
+	shutil.copytree(src, dst, copy_function=lambda s, d: materialize(s, d, hardlink, preserve_metadata=True))
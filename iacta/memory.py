@@ -0,0 +1,115 @@
+import threading
+from typing import Self
+
+from iacta.logging import dbglogger
+from iacta.types.config import Config
+
+
+class MemoryBudget:
+	"""
+	Process-wide accountant of memory held by decoded assets, bounded by `technical.memory_budget` (bytes).
+	- Sizes are estimated from file headers before decoding; a reservation blocks while the budget is exhausted.
+	- A reservation bigger than the whole budget is still granted once nothing else is reserved, so it never deadlocks.
+	- With `technical.workers` worker processes, each process gets an equal share of the budget.
+	"""
+	share: int = 1
+
+	used: int = 0
+	stage_used: dict[str, int] = {}
+	high_water: dict[str, int] = {}
+	_condition = threading.Condition()
+
+	@classmethod
+	def get_limit(cls) -> int | None:
+		config = Config.instance
+		budget = config.technical.memory_budget
+		if budget is None:
+			return None
+		return budget // cls.share
+
+	@classmethod
+	def acquire(cls, nbytes: int, stage: str) -> None:
+		limit = cls.get_limit()
+
+		with cls._condition:
+			if limit is not None:
+				waited = False
+				while cls.used and cls.used + nbytes > limit:
+					if not waited:
+						dbglogger.info(f'Memory budget exhausted ({cls.used}/{limit} bytes); stage {stage} waits for {nbytes} bytes')
+						waited = True
+					cls._condition.wait()
+
+			cls.used += nbytes
+			stage_used = cls.stage_used.get(stage, 0) + nbytes
+			cls.stage_used[stage] = stage_used
+			cls.high_water[stage] = max(cls.high_water.get(stage, 0), stage_used)
+			cls.high_water['total'] = max(cls.high_water.get('total', 0), cls.used)
+
+	@classmethod
+	def release(cls, nbytes: int, stage: str) -> None:
+		with cls._condition:
+			cls.used -= nbytes
+			cls.stage_used[stage] -= nbytes
+			cls._condition.notify_all()
+
+	@classmethod
+	def take_high_water(cls) -> dict[str, int]:
+		"""
+		Return the high-water marks (bytes) per stage and in total since the last call, and reset them.
+		"""
+		with cls._condition:
+			high_water = cls.high_water
+			cls.high_water = {}
+		return high_water
+
+	@classmethod
+	def merge_high_water(cls, high_water: dict[str, int]) -> None:
+		with cls._condition:
+			for stage, nbytes in high_water.items():
+				cls.high_water[stage] = max(cls.high_water.get(stage, 0), nbytes)
+
+	@classmethod
+	def reserve(cls, stage: str) -> 'MemoryReservation':
+		return MemoryReservation(stage)
+
+
+class MemoryReservation:
+	"""
+	Memory reserved by one stage, released all at once when leaving the `with` block.
+	- Acquire the whole estimate of a stage at once: a reservation never waits while holding memory.
+	"""
+	def __init__(self, stage: str) -> None:
+		self.stage = stage
+		self.nbytes = 0
+
+	def acquire(self, nbytes: int) -> None:
+		if self.nbytes:
+			raise RuntimeError(f'Memory for stage {self.stage} is already reserved')
+		MemoryBudget.acquire(nbytes, self.stage)
+		self.nbytes = nbytes
+
+	def release(self) -> None:
+		if self.nbytes:
+			MemoryBudget.release(self.nbytes, self.stage)
+			self.nbytes = 0
+
+	def __enter__(self) -> Self:
+		return self
+
+	def __exit__(self, *_) -> None:
+		self.release()
+
+
+def estimate_image_bytes(size: tuple[int, int]) -> int:
+	"""
+	Size of a decoded image of `size`; Pillow stores pixels of every multi-band mode in 4 bytes.
+	"""
+	w, h = size
+	return w * h * 4
+
+def estimate_pcm_bytes(duration: int, sample_rate: int, channels: int) -> int:
+	"""
+	Size of `duration` (ms) of float32 samples.
+	"""
+	return duration * sample_rate // 1000 * channels * 4
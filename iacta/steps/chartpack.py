@@ -1,31 +1,167 @@
 import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import Any
 
 try:
 	from tqdm import tqdm
 except ImportError:
 	tqdm = lambda x, /, *_, **__: x
 
-from iacta.types.chartpack import Chartpack
-from iacta.types.exceptions.general import MultipleExceptions
+from iacta.cache import ChartpackCache
+from iacta.hitsound_cache import HitsoundCache
+from iacta.logging import dbglogger, logger
+from iacta.memory import MemoryBudget
+from iacta.types.chartpack import Chartpack, ChartpackState
+from iacta.types.config import Config
+from iacta.types.exceptions.general import MultipleExceptions, ensure_picklable
 from iacta.utils import generate_random_str, truncate
+from iacta.workers import init_worker
 
 
-def get_chartpacks(entries: list[str]) -> tuple[list[Chartpack], MultipleExceptions]:
-	errors = MultipleExceptions()
-	chartpacks: list[Chartpack] = []
+type WorkerResult = tuple[ChartpackState | None, Exception | None, tuple[int, int], dict[str, int]]
+
+def _run_in_worker(func: Callable[[Any], Chartpack], arg: Any) -> WorkerResult:
+	try:
+		state, e = ChartpackState(func(arg)), None
+	except Exception as exc:
+		state, e = None, ensure_picklable(exc)
+	# hitsound cache counters and memory high-water marks of worker processes are sent back to the main process
+	return state, e, HitsoundCache.take_stats(), MemoryBudget.take_high_water()
+
+
+def _build_chartpack(entry: str, lazy: bool = False) -> Chartpack:
+	return Chartpack(entry, lazy)
+
+def _build_chartpack_assets(state: ChartpackState) -> Chartpack:
+	chartpack = state.to_chartpack()
+	chartpack.process_assets()
+	return chartpack
+
+
+type Job = tuple[Callable[[Any], Chartpack], Any]
+
+def _map_chartpacks_serial(jobs: dict[str, Job], errors: MultipleExceptions) -> dict[str, Chartpack]:
+	chartpacks: dict[str, Chartpack] = {}
 
-	with tqdm(entries, leave=False) as bar:
-		for entry in bar:
-			basename = os.path.basename(entry)
-			bar.set_description(truncate(basename, 20))
+	with tqdm(jobs.items(), leave=False) as bar:
+		for name, (func, arg) in bar:
+			bar.set_description(truncate(name, 20))
 			
 			try:
-				chartpack = Chartpack(entry)
-				chartpacks.append(chartpack)
+				chartpacks[name] = func(arg)
 			except Exception as e:
-				errors.add(basename, e)
+				errors.add(name, e)
 	
-	return chartpacks, errors
+	return chartpacks
+
+def _map_chartpacks_parallel(jobs: dict[str, Job], errors: MultipleExceptions, workers: int) -> dict[str, Chartpack]:
+	results: dict[str, WorkerResult] = {}
+
+	with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(Config.path,)) as executor:
+		futures = {executor.submit(_run_in_worker, func, arg): name for name, (func, arg) in jobs.items()}
+
+		with tqdm(as_completed(futures), total=len(futures), leave=False) as bar:
+			for future in bar:
+				name = futures[future]
+				bar.set_description(truncate(name, 20))
+				try:
+					results[name] = future.result()
+				except Exception as e:
+					results[name] = None, e, (0, 0), {}
+
+	chartpacks: dict[str, Chartpack] = {}
+	for name in jobs:
+		state, e, hitsound_stats, high_water = results[name]
+		HitsoundCache.add_stats(hitsound_stats)
+		MemoryBudget.merge_high_water(high_water)
+		if e is not None:
+			errors.add(name, e)
+			continue
+
+		assert state is not None
+		chartpacks[name] = state.to_chartpack()
+
+	return chartpacks
+
+def _map_chartpacks(jobs: dict[str, Job], errors: MultipleExceptions) -> dict[str, Chartpack]:
+	"""
+	Run every job (function and its argument), either in this process or in a process pool, depending on `technical.workers`.
+	- Jobs must be picklable; failed jobs are reported to `errors` under their names.
+	"""
+	config = Config.instance
+	workers = config.technical.workers
+
+	# interactive songlist choosing cannot be done from worker processes
+	if workers == 1 or config.songlist.choosing == 'ask':
+		return _map_chartpacks_serial(jobs, errors)
+	else:
+		return _map_chartpacks_parallel(jobs, errors, workers)
+
+def _report_hitsound_cache() -> None:
+	hits, misses = HitsoundCache.take_stats()
+	if hits or misses:
+		logger.info(f'Hitsound cache: {hits} hits, {misses} misses')
+
+def _report_memory() -> None:
+	high_water = MemoryBudget.take_high_water()
+	for stage, nbytes in high_water.items():
+		dbglogger.info(f'Memory high-water mark of decoded assets ({stage}): {nbytes / 1024 ** 2:.1f} MiB')
+
+
+def get_chartpacks(entries: list[str], lazy: bool = False) -> tuple[list[Chartpack], MultipleExceptions]:
+	"""
+	Build chartpacks from unzipped folders.
+	- If `lazy`, only songlists are processed; call `process_chartpack_assets` to process the rest later.
+	- Folders restored from the chartpack cache reuse the cached state instead of being processed again.
+	"""
+	errors = MultipleExceptions()
+	cache = ChartpackCache.get()
+
+	names = {entry: os.path.basename(entry) for entry in entries}
+	chartpacks: dict[str, Chartpack] = {}
+	jobs: dict[str, Job] = {}
+
+	for entry, name in names.items():
+		state = cache.load_state(entry) if cache is not None else None
+		if state is None:
+			jobs[name] = partial(_build_chartpack, lazy=lazy), entry
+		elif lazy or state.assets_processed:
+			chartpacks[name] = state.to_chartpack()
+		else:
+			jobs[name] = _build_chartpack_assets, state
+	
+	built = _map_chartpacks(jobs, errors)
+	if cache is not None:
+		for chartpack in built.values():
+			cache.store(chartpack)
+	chartpacks.update(built)
+
+	_report_hitsound_cache()
+	_report_memory()
+	return [chartpacks[name] for name in names.values() if name in chartpacks], errors
+
+def process_chartpack_assets(chartpacks: list[Chartpack]) -> tuple[list[Chartpack], MultipleExceptions]:
+	"""
+	Run the deferred asset stages of lazily built chartpacks. Chartpacks failing these stages are dropped.
+	"""
+	errors = MultipleExceptions()
+	cache = ChartpackCache.get()
+
+	jobs: dict[str, Job] = {
+		os.path.basename(chartpack.root): (_build_chartpack_assets, ChartpackState(chartpack))
+		for chartpack in chartpacks
+	}
+
+	built = _map_chartpacks(jobs, errors)
+	if cache is not None:
+		for chartpack in built.values():
+			cache.store(chartpack)
+
+	_report_hitsound_cache()
+	_report_memory()
+	return list(built.values()), errors
 
 def deduplicate_ids(chartpacks: list[Chartpack]) -> tuple[list[Chartpack], MultipleExceptions]:
 	errors = MultipleExceptions()
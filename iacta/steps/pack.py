@@ -1,14 +1,25 @@
 import json
 import os
+import posixpath
 import random
 import shutil
+import stat
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Self
+from zipfile import ZIP_BZIP2, ZIP_DEFLATED, ZIP_LZMA, ZIP_STORED, ZipFile, ZipInfo
 
-from PIL import Image
+from tqdm import tqdm
 
 from mortis import SonglistItem
-from iacta.types.chartpack import Chartpack
-from iacta.types.config import Config
+from iacta.foolish_cover_cache import FoolishCoverCache
+from iacta.types.chartpack import Chartpack, ChartpackState
+from iacta.types.config import CompressionConfig, CompressionRule, Config
+from iacta.types.exceptions.general import MultipleExceptions, ensure_picklable
 from iacta.types.misc import RatingClassEnumExt
+from iacta.utils import temp_sibling
+from iacta.workers import init_worker
 
 
 def distribute_into_sessions(chartpacks: list[Chartpack]) -> dict[int, list[Chartpack]]:
@@ -21,67 +32,136 @@ def distribute_into_sessions(chartpacks: list[Chartpack]) -> dict[int, list[Char
 		session_packs[session].append(chartpack)
 	return session_packs
 
-def create_session_dirs(n: int) -> None:
-	config = Config.instance
-	for i in range(1, n + 1):
-		session_str = f'第 {i} 场谱包'
-		path = os.path.join(config.paths.chartpacks, session_str)
-		if os.path.exists(path):
-			shutil.rmtree(path)
-		os.makedirs(path, exist_ok=True)
+class SessionArchive:
+	"""
+	Zip archive of a session, written directly from the chartpack folders without a staging directory.
+	- Entries look like those of `shutil.make_archive` over the session layout: every parent directory gets
+	its own entry, and all timestamps are `technical.file_edit_time`.
+	- Files are compressed according to `technical.compression` (or `policy`), by extension.
+	- Files are streamed into the archive, except those with a compression level before Python 3.13,
+	since only `writestr` takes a level there.
+	- The archive is written to a temporary sibling and moved into place once complete.
+	"""
+	methods = {'stored': ZIP_STORED, 'deflated': ZIP_DEFLATED, 'bzip2': ZIP_BZIP2, 'lzma': ZIP_LZMA}
+	# `ZipInfo.compress_level` is public since Python 3.13
+	streams_levels = sys.version_info >= (3, 13)
 
-		for subdir in ('img/bg', 'songs', 'covers'):
-			if os.path.exists(os.path.join(path, subdir)):
-				shutil.rmtree(os.path.join(path, subdir))
-			os.makedirs(os.path.join(path, subdir), exist_ok=True)
+	def __init__(self, path: str, policy: CompressionConfig | None = None) -> None:
+		config = Config.instance
+
+		self.path = path
+		self.policy = policy if policy is not None else config.technical.compression
+		self.date_time = time.localtime(config.technical.file_edit_time)[:6]
+		self.dirs: set[str] = set()
+		self.names: set[str] = set()
+
+		self._tmp = temp_sibling(path)
+		self._zip = ZipFile(self._tmp, 'w', ZIP_DEFLATED)
+
+	def __enter__(self) -> Self:
+		return self
+
+	def __exit__(self, exc_type, *_) -> None:
+		self._zip.close()
+		if exc_type is None:
+			os.replace(self._tmp, self.path)
+		elif os.path.exists(self._tmp):
+			os.remove(self._tmp)
+
+	def _info(self, arcname: str, mode: int) -> ZipInfo:
+		info = ZipInfo(arcname, self.date_time)
+		info.external_attr = (mode & 0xFFFF) << 16
+		return info
+
+	def _get_rule(self, arcname: str) -> CompressionRule:
+		return self.policy.get_rule(posixpath.basename(arcname))
+
+	def add_dir(self, arcname: str) -> None:
+		parent = posixpath.dirname(arcname)
+		if parent:
+			self.add_dir(parent)
+		if arcname in self.dirs:
+			return
+		self.dirs.add(arcname)
+
+		info = self._info(arcname + '/', stat.S_IFDIR | 0o755)
+		info.external_attr |= 0x10  # MS-DOS directory flag
+		self._zip.writestr(info, b'', ZIP_STORED)
+
+	def _add_parents(self, arcname: str) -> bool:
+		"""
+		Add the parent directories of `arcname`; return `False` if an entry with this name is already written.
+		"""
+		if arcname in self.names:
+			return False
+		self.names.add(arcname)
+
+		parent = posixpath.dirname(arcname)
+		if parent:
+			self.add_dir(parent)
+		return True
+
+	def add_file(self, src: str, arcname: str) -> None:
+		if not self._add_parents(arcname):
+			return
 
-def backup_covers_to(chartpack: Chartpack, dst_path: str) -> None:
-	if os.path.exists(dst_path):
-		shutil.rmtree(dst_path)
-	os.makedirs(dst_path, exist_ok=True)
+		st = os.stat(src)
+		info = self._info(arcname, st.st_mode)
+		rule = self._get_rule(arcname)
+		info.compress_type = self.methods[rule.method]
 
+		if rule.level is not None and not self.streams_levels:
+			with open(src, 'rb') as fsrc:
+				self._zip.writestr(info, fsrc.read(), compresslevel=rule.level)
+			return
+
+		info.file_size = st.st_size
+		if rule.level is not None:
+			info.compress_level = rule.level
+		with open(src, 'rb') as fsrc, self._zip.open(info, 'w') as fdst:
+			shutil.copyfileobj(fsrc, fdst, 1 << 20)
+
+	def add_bytes(self, data: bytes, arcname: str) -> None:
+		if not self._add_parents(arcname):
+			return
+
+		info = self._info(arcname, stat.S_IFREG | 0o644)
+		rule = self._get_rule(arcname)
+		self._zip.writestr(info, data, self.methods[rule.method], rule.level)
+
+def add_covers_backup(chartpack: Chartpack, archive: SessionArchive) -> None:
+	archive.add_dir(f'covers/{chartpack.id}')
 	for src_list in chartpack.covers_names.values():
 		for src_name in src_list:
-			src = os.path.join(chartpack.root, src_name)
-			dst = os.path.join(dst_path, src_name)
-			shutil.copy2(src, dst)
-
-def copy_assets_to(chartpack: Chartpack, dst_path: str) -> None:
-	if os.path.exists(dst_path):
-		shutil.rmtree(dst_path)
-	os.makedirs(dst_path, exist_ok=True)
+			archive.add_file(os.path.join(chartpack.root, src_name), f'covers/{chartpack.id}/{src_name}')
 
+def add_assets(chartpack: Chartpack, archive: SessionArchive) -> None:
+	archive.add_dir(f'songs/{chartpack.id}')
 	for src in chartpack.assets_woimgs:
-		dst = os.path.join(dst_path, os.path.basename(src))
-		shutil.copy2(src, dst)
-
-def copy_backgrounds_to(chartpack: Chartpack, dst_path: str) -> None:
-	if os.path.exists(dst_path):
-		shutil.rmtree(dst_path)
-	os.makedirs(dst_path, exist_ok=True)
+		archive.add_file(src, f'songs/{chartpack.id}/{os.path.basename(src)}')
 
+def collect_backgrounds(chartpack: Chartpack, backgrounds: dict[str, str]) -> None:
+	"""
+	Collect backgrounds shared by the session (arcname -> source); later chartpacks win on name clashes.
+	"""
 	for src_name in chartpack.background_names.values():
-		src = os.path.join(chartpack.root, src_name)
-		dst = os.path.join(dst_path, src_name)
-		shutil.copy2(src, dst)
+		backgrounds[f'img/bg/{src_name}'] = os.path.join(chartpack.root, src_name)
 	
-def assign_random_cover(chartpack: Chartpack, dst_path: str, choices: list[str]) -> None:
+def pick_foolish_pic(chartpack: Chartpack, choices: list[str]) -> str:
 	config = Config.instance
 	presets = config.chartpack.covers.preset_foolish_pics
 
 	id = chartpack.id
-	src = presets[id] if id in presets else random.choice(choices)
+	return presets[id] if id in presets else random.choice(choices)
 
-	with Image.open(src) as img:
-		
-		for template, size in config.chartpack.covers.normalize_to.items():
-			resized = img.resize(size, Image.Resampling.LANCZOS)
-
-			dst_name = template.build(RatingClassEnumExt.Base.value)
-			dst = os.path.join(dst_path, dst_name)
+def add_foolish_cover(chartpack: Chartpack, archive: SessionArchive, src: str) -> None:
+	config = Config.instance
+	id = chartpack.id
 
-			converted = resized.convert('RGB')
-			converted.save(dst, format='JPEG')
+	entries = FoolishCoverCache.render(src)
+	for template, size in config.chartpack.covers.normalize_to.items():
+		dst_name = template.build(RatingClassEnumExt.Base.value)
+		archive.add_file(entries[size], f'songs/{id}/{dst_name}')
 
 def mask_songlist(chartpack: Chartpack) -> SonglistItem:
 	config = Config.instance
@@ -105,48 +185,103 @@ def mask_songlist(chartpack: Chartpack) -> SonglistItem:
 	return copied
 
 
-def pack_zipfiles(chartpacks: list[Chartpack]) -> None:
+def pack_session(i: int, packs: list[Chartpack], foolish_srcs: dict[str, str]) -> None:
+	"""
+	Build the archive of session `i`, with the foolish cover source of each chartpack chosen beforehand.
+	"""
 	config = Config.instance
-	session_packs = distribute_into_sessions(chartpacks)
-	create_session_dirs(len(session_packs))
-
-	foolish_pics: list[str] = [entry.path for entry in os.scandir(config.paths.foolish_pics) if entry.is_file()]
+	session_str = f'第 {i} 场谱包'
+	zip_path = os.path.join(config.paths.chartpacks, f'{session_str}.zip')
+	
+	original_songlists: list[dict] = []
+	masked_songlists: list[dict] = []
+	backgrounds: dict[str, str] = {}
 
-	for i, packs in session_packs.items():
-		session_str = f'第 {i} 场谱包'
-		session_dir = os.path.join(config.paths.chartpacks, session_str)
-		bg_dir = os.path.join(session_dir, 'img/bg')
-		
-		original_songlists: list[dict] = []
-		masked_songlists: list[dict] = []
+	with SessionArchive(zip_path) as archive:
+		for subdir in ('img/bg', 'songs', 'covers'):
+			archive.add_dir(subdir)
 
 		for pack in packs:
-			pack_dir = os.path.join(session_dir, 'songs', pack.id)
-			pack_cover_dir = os.path.join(session_dir, 'covers', pack.id)
-
-			backup_covers_to(pack, pack_cover_dir)
-			copy_backgrounds_to(pack, bg_dir)
-			copy_assets_to(pack, pack_dir)
-			assign_random_cover(pack, pack_dir, foolish_pics)
+			add_covers_backup(pack, archive)
+			collect_backgrounds(pack, backgrounds)
+			add_assets(pack, archive)
+			add_foolish_cover(pack, archive, foolish_srcs[pack.id])
 
 			original_songlists.append(pack.songlist.to_dict())
 			masked_songlists.append(mask_songlist(pack).to_dict())
 		
-		original_songlist_path = os.path.join(session_dir, 'songs/songlist_original')
-		with open(original_songlist_path, 'w', encoding='utf-8') as f:
-			json.dump({'songs': original_songlists}, f, ensure_ascii=False, indent=4)
-			
-		masked_songlist_path = os.path.join(session_dir, 'songs/songlist')
-		with open(masked_songlist_path, 'w', encoding='utf-8') as f:
-			json.dump({'songs': masked_songlists}, f, ensure_ascii=False, indent=4)
-		
-		# make all files have the same modification time
-		time = config.technical.file_edit_time
-		for root, _, files in os.walk(session_dir):
-			os.utime(root, (time, time))
-			for filename in files:
-				file_path = os.path.join(root, filename)
-				os.utime(file_path, (time, time))
-		
-		shutil.make_archive(session_dir, 'zip', session_dir)
-		shutil.rmtree(session_dir)
\ No newline at end of file
+		for arcname, src in backgrounds.items():
+			archive.add_file(src, arcname)
+
+		original = json.dumps({'songs': original_songlists}, ensure_ascii=False, indent=4)
+		archive.add_bytes(original.encode('utf-8'), 'songs/songlist_original')
+
+		masked = json.dumps({'songs': masked_songlists}, ensure_ascii=False, indent=4)
+		archive.add_bytes(masked.encode('utf-8'), 'songs/songlist')
+
+def _pack_session_in_worker(i: int, states: list[ChartpackState], foolish_srcs: dict[str, str]) -> Exception | None:
+	try:
+		pack_session(i, [state.to_chartpack() for state in states], foolish_srcs)
+	except Exception as e:
+		return ensure_picklable(e)
+	return None
+
+
+def _pack_sessions_serial(
+	session_packs: dict[int, list[Chartpack]], foolish_srcs: dict[str, str], errors: MultipleExceptions
+) -> None:
+	with tqdm(session_packs.items(), leave=False) as bar:
+		for i, packs in bar:
+			bar.set_description(f'第 {i} 场谱包')
+			try:
+				pack_session(i, packs, foolish_srcs)
+			except Exception as e:
+				errors.add(f'第 {i} 场谱包', e)
+
+def _pack_sessions_parallel(
+	session_packs: dict[int, list[Chartpack]], foolish_srcs: dict[str, str], errors: MultipleExceptions, workers: int
+) -> None:
+	results: dict[int, Exception | None] = {}
+
+	with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(Config.path,)) as executor:
+		futures = {
+			executor.submit(_pack_session_in_worker, i, [ChartpackState(pack) for pack in packs], foolish_srcs): i
+			for i, packs in session_packs.items()
+		}
+
+		with tqdm(as_completed(futures), total=len(futures), leave=False) as bar:
+			for future in bar:
+				i = futures[future]
+				bar.set_description(f'第 {i} 场谱包')
+				try:
+					results[i] = future.result()
+				except Exception as e:
+					results[i] = e
+
+	for i in session_packs:
+		if results[i] is not None:
+			errors.add(f'第 {i} 场谱包', results[i])
+
+
+def pack_zipfiles(chartpacks: list[Chartpack]) -> None:
+	"""
+	Build the archive of every session, in a process pool if `technical.workers` allows.
+	- Sessions are independent: a failed session does not stop the others, and all failures are raised together.
+	"""
+	config = Config.instance
+	workers = config.technical.workers
+	session_packs = distribute_into_sessions(chartpacks)
+	os.makedirs(config.paths.chartpacks, exist_ok=True)
+
+	foolish_pics: list[str] = [entry.path for entry in os.scandir(config.paths.foolish_pics) if entry.is_file()]
+	# chosen here in chartpack order, so that worker processes do not draw from copies of the same random state
+	foolish_srcs = {pack.id: pick_foolish_pic(pack, foolish_pics) for packs in session_packs.values() for pack in packs}
+
+	errors = MultipleExceptions()
+	if workers == 1 or len(session_packs) <= 1:
+		_pack_sessions_serial(session_packs, foolish_srcs, errors)
+	else:
+		_pack_sessions_parallel(session_packs, foolish_srcs, errors, min(workers, len(session_packs)))
+
+	if errors:
+		raise errors
@@ -8,6 +8,7 @@ from iacta.types.chartpack import Chartpack
 from iacta.types.config import Config
 from iacta.types.exceptions.general import MultipleExceptions
 from iacta.types.misc import ExtRatingClassEnum, RatingClassEnumExt
+from iacta.materialize import materialize
 from iacta.utils import pick_biggest_image
 
 
@@ -66,7 +67,8 @@ def collect_radio_files(chartpacks: list[Chartpack]) -> None:
 
 			for src, dst in assets.items():
 				try:
-					shutil.copy2(src, dst)
+					# radio files are final outputs that are never modified, so they may share the inode of their source
+					materialize(src, dst, preserve_metadata=True)
 				except Exception as e:
 					errors.add(src, e)
 
@@ -1,57 +1,118 @@
 import os
 import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
 from zipfile import ZipFile
 
+from iacta.cache import ChartpackCache
 from iacta.types.config import Config
 from iacta.types.exceptions.general import MultipleExceptions
 from iacta.types.exceptions.file import NotAZipError
 
 
-def _unzip_chartpack(entry: os.DirEntry[str]) -> str | None:
+def _split_zip_name(entry: os.DirEntry[str]) -> tuple[str, bool]:
+	if not entry.is_file():
+		return entry.name, False
+
+	entry_name, ext = os.path.splitext(entry.name)
+	ext = ext.lower().strip()
+	return entry_name, (ext == '.zip')
+
+
+def _handle_nonzip(entry: os.DirEntry[str]) -> None:
 	config = Config.instance
-	root = config.paths.root
 
-	if not entry.is_file():
-		entry_name = entry.name
-		is_zip = False
-	else:
-		entry_name, ext = os.path.splitext(entry.name)
-		ext = ext.lower().strip()
-		is_zip = (ext == '.zip')
+	strat = config.preparation.nonzip_items
+	if strat == 'ask':
+		c = input(f'Path ({entry.path}) is not a zip file. What to do? (remove/ignore/*=halt): ').lower().strip()
+		strat = c if c == 'remove' or c == 'ignore' else 'forbid'
+
+	if strat == 'forbid':
+		raise NotAZipError(entry.path)
+	elif strat == 'ignore':
+		pass
+	elif strat == 'remove':
+		os.remove(entry) if entry.is_file() else shutil.rmtree(entry)
+
+
+def _extract_zip(entry: os.DirEntry[str], entry_name: str) -> str:
+	config = Config.instance
+	root = config.paths.root
 
-	if not is_zip:
-		strat = config.preparation.nonzip_items
-		if strat == 'ask':
-			c = input(f'Path ({entry.path}) is not a zip file. What to do? (remove/ignore/*=halt): ').lower().strip()
-			strat = c if c == 'remove' or c == 'ignore' else 'forbid'
-		
-		if strat == 'forbid':
-			raise NotAZipError(entry.path)
-		elif strat == 'ignore':
-			pass
-		elif strat == 'remove':
-			os.remove(entry) if entry.is_file() else shutil.rmtree(entry)
-		return None
-	
 	dst = os.path.join(root, entry_name)
+
+	cache = ChartpackCache.get()
+	if cache is not None and cache.restore_folder(cache.get_key(entry.path), dst):
+		return dst
+
 	with ZipFile(entry, 'r') as zip:
 		zip.extractall(dst)
 	return dst
 
 
-def unzip_chartpacks() -> tuple[list[str], MultipleExceptions]:
-	config = Config.instance
-	zipfiles = config.paths.zipfiles
+def _unzip_chartpack(entry: os.DirEntry[str]) -> str | None:
+	entry_name, is_zip = _split_zip_name(entry)
+	if not is_zip:
+		_handle_nonzip(entry)
+		return None
+	return _extract_zip(entry, entry_name)
 
-	errors = MultipleExceptions()
 
+def _unzip_serial(entries: list[os.DirEntry[str]], errors: MultipleExceptions) -> list[str]:
 	unzipped: list[str] = []
-	for entry in os.scandir(zipfiles):
+	for entry in entries:
 		try:
 			dst = _unzip_chartpack(entry)
 			if dst:
 				unzipped.append(dst)
 		except Exception as e:
 			errors.add(entry.name, e)
-	
-	return unzipped, errors
\ No newline at end of file
+	return unzipped
+
+
+def _unzip_parallel(entries: list[os.DirEntry[str]], errors: MultipleExceptions, workers: int) -> list[str]:
+	results: dict[str, Future[str] | Exception | None] = {}
+
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		for entry in entries:
+			entry_name, is_zip = _split_zip_name(entry)
+			if is_zip:
+				results[entry.name] = executor.submit(_extract_zip, entry, entry_name)
+				continue
+
+			# non-zip items are handled on the calling thread, so that interactive prompts never interleave
+			try:
+				_handle_nonzip(entry)
+				results[entry.name] = None
+			except Exception as e:
+				results[entry.name] = e
+
+	unzipped: list[str] = []
+	for name, result in results.items():
+		if result is None:
+			continue
+		if isinstance(result, Exception):
+			errors.add(name, result)
+			continue
+
+		try:
+			unzipped.append(result.result())
+		except Exception as e:
+			errors.add(name, e)
+
+	return unzipped
+
+
+def unzip_chartpacks() -> tuple[list[str], MultipleExceptions]:
+	config = Config.instance
+	zipfiles = config.paths.zipfiles
+	workers = config.technical.workers
+
+	errors = MultipleExceptions()
+	entries = list(os.scandir(zipfiles))
+
+	if workers == 1:
+		unzipped = _unzip_serial(entries, errors)
+	else:
+		unzipped = _unzip_parallel(entries, errors, workers)
+
+	return unzipped, errors
@@ -1,25 +1,33 @@
+import hashlib
 import os
+import threading
+from collections.abc import Callable, Iterable
 from os import DirEntry
 from typing import Literal
 
 from tqdm import tqdm
 
-from mortis import AFF, Arc, ArcType, Backgrounds, HitsoundStr, RatingClassEnum as Rtcls, SonglistItem
-from pydub import AudioSegment
+from mortis import AFF, Arc, Backgrounds, HitsoundStr, RatingClassEnum as Rtcls, SonglistItem
 from PIL import Image
 
+from iacta.aff_visitor import AFFVisitor, BannedArcParamsRule, BannedGroupParamsRule, HitsoundArcsRule, TPDFRangeRule
+from iacta.audio import AudioInfo, conform_audio, probe_audio, render_previews
+from iacta.hitsound_cache import HitsoundCache
+from iacta.memory import MemoryBudget, estimate_image_bytes, estimate_pcm_bytes
 from iacta.types.config import Config
 from iacta.types.event_info import EventInfoItem
 from iacta.types.exceptions.general import MultipleExceptions, UnreachableBranch
 from iacta.types.exceptions.file import AmbiguousSonglistError, BadChartpackError, MissingSonglistError, PathNotFoundError
 from iacta.types.misc import DurationMs, ExtRatingClassEnum as ExtRtcls, RatingClassEnumExt
 from iacta.types.songlist.extmodel import SpSonglistItem
-from iacta.utils import pick_biggest_image
+from iacta.utils import ImageSizeIndex, dump_if_changed, encode_image, pick_biggest_image, run_dag, write_if_changed
 
 
 class Chartpack:
-	def __init__(self, path: str) -> None:
-		self.reset(path)
+	show_progress: bool = True
+
+	def __init__(self, path: str, lazy: bool = False) -> None:
+		self.reset(path, lazy)
 	
 	@property
 	def id(self) -> str:
@@ -40,9 +48,20 @@ class Chartpack:
 		os.rename(self.root, new_root)
 		self.root = new_root
 	
-	def reset(self, path: str) -> None:
+	@property
+	def errors(self) -> MultipleExceptions:
+		# while a stage is running, its errors go to a stage-local collector (see `process_all`)
+		return getattr(self._stage_local, 'errors', self._errors)
+	
+	@errors.setter
+	def errors(self, value: MultipleExceptions) -> None:
+		self._errors = value
+	
+	def reset(self, path: str, lazy: bool = False) -> None:
 		self.root: str = path
+		self._stage_local = threading.local()
 		self.errors = MultipleExceptions()
+		self.assets_processed: bool = False
 		
 		self.songlist_name: str
 		self.songlist: SonglistItem
@@ -50,12 +69,14 @@ class Chartpack:
 
 		self.aff_names: dict[Rtcls, str] = {}
 		self._affs_temp: dict[Rtcls, AFF] = {}
+		self._hitsound_arcs_temp: list[Arc] = []
+		self._aff_errors_temp = MultipleExceptions()
 
 		self.hitsounds: set[HitsoundStr] = set()
-		self._hitsound_audios_temp: dict[HitsoundStr, AudioSegment] = {}
+		self._hitsound_infos_temp: dict[HitsoundStr, AudioInfo] = {}
 		
 		self.audio_names: dict[ExtRtcls, str] = {}
-		self._audios_temp: dict[ExtRtcls, AudioSegment] = {}
+		self._audio_infos_temp: dict[ExtRtcls, AudioInfo] = {}
 		self.preview_names: dict[ExtRtcls, str] = {}
 
 		self.covers_names: dict[ExtRtcls, list[str]] = {}
@@ -64,18 +85,41 @@ class Chartpack:
 		self.background_names: dict[str, str] = {}
 		self._backgrounds_temp: dict[str, Image.Image] = {}
 
-		self.process()
+		self.process(lazy)
 		
 	################################################################################################################
 
-	def process(self) -> None:
+	def process(self, lazy: bool = False) -> None:
+		"""
+		Process the chartpack. If `lazy`, only the songlist is processed and audio lengths are checked,
+		and the asset stages are deferred to `process_assets`.
+		"""
 		try:
-			self.process_all()
+			if lazy:
+				self.run_stages(['songlist'])
+				self.validate_audios()
+			else:
+				self.process_all()
 			if self.errors:
 				raise self.errors
 			self.solve_category()
 		except Exception as e:
 			raise BadChartpackError(self.root, e)
+	
+	def process_assets(self) -> None:
+		"""
+		Run the asset stages deferred by a lazily processed chartpack. Does nothing if they have already been run.
+		"""
+		if self.assets_processed:
+			return
+		
+		try:
+			self.run_stages(name for name in self.stages if name != 'songlist')
+			self.assets_processed = True
+			if self.errors:
+				raise self.errors
+		except Exception as e:
+			raise BadChartpackError(self.root, e)
 
 	@property
 	def is_bonus(self) -> bool:
@@ -117,21 +161,58 @@ class Chartpack:
 
 	################################################################################################################
 
+	@property
+	def stages(self) -> dict[str, tuple[Callable[[], None], tuple[str, ...]]]:
+		return {
+			'songlist': (self.process_songlist, ()),
+			'AFF / 特殊音频': (self.process_affs, ('songlist',)),
+			'曲绘': (self.process_covers, ('songlist',)),
+			'音源': (self.process_audios, ('songlist',)),
+			'背景': (self.process_backgrounds, ('songlist',)),
+			'清理冗余文件': (self.remove_redundant, ('AFF / 特殊音频', '曲绘', '音源', '背景')),
+		}
+
 	def process_all(self) -> None:
-		steps = {
-			'songlist': self.process_songlist,
-			'AFF / 特殊音频': self.process_affs,
-			'曲绘': self.process_covers,
-			'音源': self.process_audios,
-			'背景': self.process_backgrounds,
-			'清理冗余文件': self.remove_redundant,
+		self.run_stages(self.stages)
+		self.assets_processed = True
+
+	def run_stages(self, step_names: Iterable[str]) -> None:
+		config = Config.instance
+
+		stages = self.stages
+		steps = {step_name: stages[step_name] for step_name in step_names}
+
+		# each stage collects its own errors, merged afterwards in declaration order regardless of completion order;
+		# dependencies outside the selection are assumed to have been run already
+		stage_errors = {step_name: MultipleExceptions() for step_name in steps}
+		tasks = {
+			step_name: (
+				self._stage_runner(step, stage_errors[step_name]),
+				tuple(dep for dep in deps if dep in steps)
+			)
+			for step_name, (step, deps) in steps.items()
 		}
 
-		with tqdm(total=len(steps), unit='step', leave=False) as bar:
-			for step_name, step in steps.items():
+		with tqdm(total=len(steps), unit='step', leave=False, disable=not self.show_progress) as bar:
+			def on_done(step_name: str) -> None:
 				bar.set_description(step_name)
-				step()
 				bar.update()
+			
+			try:
+				run_dag(tasks, config.technical.stage_workers, on_done)
+			finally:
+				for errors in stage_errors.values():
+					for k, e in errors.exceptions.items():
+						self.errors.add(k, e)
+
+	def _stage_runner(self, step: Callable[[], None], errors: MultipleExceptions) -> Callable[[], None]:
+		def run() -> None:
+			self._stage_local.errors = errors
+			try:
+				step()
+			finally:
+				del self._stage_local.errors
+		return run
 
 	def solve_category(self) -> None:
 		self.event_info.category = 'B' if self.is_bonus else 'A'
@@ -204,30 +285,14 @@ class Chartpack:
 			raise UnreachableBranch
 	
 	def load_songlist(self) -> None:
-		config = Config.instance
-
 		self.songlist: SonglistItem
 		self.event_info: EventInfoItem
 	
 		songlist_path = os.path.join(self.root, self.songlist_name)
 		with open(songlist_path, 'r', encoding='utf-8') as f:
-			raw = f.read()
+			raw = SpSonglistItem.strip_tail_comma(f.read())
 
-		raw = raw.strip()
-		strat = config.songlist.tail_comma
-		if strat == 'allow':
-			if raw.endswith(','):
-				raw = raw[:-1]
-		elif strat == 'forbid':
-			pass
-		elif strat == 'require':
-			if not raw.endswith(','):
-				raise ValueError(f'Songlist must end with a comma')
-			raw = raw[:-1]
-		else:
-			raise UnreachableBranch
-
-		sp_songlist = SpSonglistItem.loads(raw)
+		sp_songlist = SpSonglistItem.model_validate_json(raw, context=SpSonglistItem.validation_context())
 		self.songlist = sp_songlist.norm_songlist()
 		self.event_info = sp_songlist.event_info
 
@@ -238,8 +303,9 @@ class Chartpack:
 		src = os.path.join(self.root, self.songlist_name)
 		dst = os.path.join(self.root, dst_name)
 		try:
-			os.remove(src)
-			self.songlist.dump_to_path(dst, indent=4)
+			dump_if_changed(dst, lambda path: self.songlist.dump_to_path(path, indent=4))
+			if src != dst:
+				os.remove(src)
 			self.songlist_name = dst_name
 		except Exception as e:
 			basename = os.path.basename(dst)
@@ -251,15 +317,17 @@ class Chartpack:
 		self.reset_affs()
 		self.find_affs()
 		self.load_affs()
-		self.process_hitsounds()
 		self.check_affs()
-		self.check_nonbonus_affs()
+		self.process_hitsounds()
+		self.report_aff_checks()
 		self.normalize_affs()
 		self.free_affs()
 
 	def reset_affs(self) -> None:
 		self.aff_names: dict[Rtcls, str] = {}
 		self._affs_temp: dict[Rtcls, AFF] = {}
+		self._hitsound_arcs_temp: list[Arc] = []
+		self._aff_errors_temp = MultipleExceptions()
 
 	def find_affs(self) -> None:
 		self.aff_names: dict[Rtcls, str]
@@ -285,50 +353,34 @@ class Chartpack:
 			except Exception as e:
 				self.errors.add(basename, e)
 	
-	def check_affs(self) -> None: 
-		for rtcls, aff in self._affs_temp.items():
-			aff_name = self.aff_names[rtcls]
-
-			for i, group in enumerate(aff.iter_groups()):
-				group_name = aff_name + f' [tg #{i}]'
-				if group.anglex is not None:
-					self.errors.add(group_name, 'Parameter \'anglex\' is banned')
-				if group.angley is not None:
-					self.errors.add(group_name, 'Parameter \'angley\' is banned')
-				
-				for j, event in enumerate(group.iter_events()):
-					event_name = group_name + f' [event #{j}] ({type(event).__name__})'
-					if isinstance(event, Arc):
-						if event.type_ == ArcType.Designant:
-							self.errors.add(event_name, f'Parameter value \'{ArcType.Designant}\' for \'type_\' is banned')
-						if event.smoothness is not None:
-							self.errors.add(event_name, f'Parameter \'smoothness\' is banned')
-	
-	def check_nonbonus_affs(self) -> None:
-		if self.event_info.is_bonus:
-			return
-		
+	def check_affs(self) -> None:
 		config = Config.instance
+
+		# all checks share a single traversal per AFF; arcs with custom hitsounds are collected along the way
+		hitsound_arcs = HitsoundArcsRule()
+		visitor = AFFVisitor([BannedGroupParamsRule(), BannedArcParamsRule(), hitsound_arcs])
 		for rtcls, aff in self._affs_temp.items():
-			tpdf = aff.unwrap_tpdf()
-			mintpdf, maxtpdf = config.chartpack.aff.tpdf_range
-			if tpdf <= maxtpdf and tpdf >= mintpdf:
-				continue
+			visitor.run(aff, self.aff_names[rtcls], self._aff_errors_temp)
 
-			if tpdf < mintpdf:
-				msg = f'TPDF falls under minimum {mintpdf} (got {tpdf})'
-			else:
-				msg = f'TPDF exceeds maximum {maxtpdf} (got {tpdf})'
-			
-			aff_name = self.aff_names[rtcls]
-			self.errors.add(aff_name, msg)
+		# TPDF errors of all AFFs follow the other ones; the rule reads no events, so this does not traverse again
+		if not self.event_info.is_bonus:
+			tpdf_visitor = AFFVisitor([TPDFRangeRule(*config.chartpack.aff.tpdf_range)])
+			for rtcls, aff in self._affs_temp.items():
+				tpdf_visitor.run(aff, self.aff_names[rtcls], self._aff_errors_temp)
+		
+		self._hitsound_arcs_temp = hitsound_arcs.arcs
+
+	def report_aff_checks(self) -> None:
+		# reported after the errors of hitsounds, as when AFFs were checked after processing them
+		for name, e in self._aff_errors_temp.exceptions.items():
+			self.errors.add(name, e)
 
 	def normalize_affs(self) -> None:
 		for rtcls, aff in self._affs_temp.items():
 			dst_name = f'{rtcls.value}.aff'
 			dst = os.path.join(self.root, dst_name)
 			try:
-				aff.dump_to_path(dst)
+				dump_if_changed(dst, aff.dump_to_path)
 			except Exception as e:
 				self.errors.add(dst_name, e)
 				continue
@@ -336,6 +388,8 @@ class Chartpack:
 	
 	def free_affs(self) -> None:
 		del self._affs_temp
+		del self._hitsound_arcs_temp
+		del self._aff_errors_temp
 
 
 	def process_hitsounds(self) -> None:
@@ -348,15 +402,12 @@ class Chartpack:
 
 	def reset_hitsounds(self) -> None:
 		self.hitsounds: set[HitsoundStr] = set()
-		self._hitsound_audios_temp: dict[HitsoundStr, AudioSegment] = {}
+		self._hitsound_infos_temp: dict[HitsoundStr, AudioInfo] = {}
 
 	def find_hitsounds(self) -> None:
 		self.hitsounds: set[HitsoundStr]
 
-		hitsounds: set[HitsoundStr] = set()
-		for aff in self._affs_temp.values():
-			hitsounds |= aff.required_hitsounds
-		
+		hitsounds: set[HitsoundStr] = {arc.hitsound for arc in self._hitsound_arcs_temp}
 		for hitsound in hitsounds:
 			basename = hitsound.unwrap()
 			assert basename is not None
@@ -395,53 +446,50 @@ class Chartpack:
 			except Exception as e:
 				self.errors.add(basename, e)
 		
-		for aff in self._affs_temp.values():
-			for event in aff.iter_events():
-				if not isinstance(event, Arc) or event.hitsound not in to_modify:
-					continue
-				event.hitsound = to_modify[event.hitsound]
+		for arc in self._hitsound_arcs_temp:
+			if arc.hitsound in to_modify:
+				arc.hitsound = to_modify[arc.hitsound]
 	
 	def load_hitsounds(self) -> None:
-		self._hitsound_audios_temp: dict[HitsoundStr, AudioSegment]
+		self._hitsound_infos_temp: dict[HitsoundStr, AudioInfo]
 
 		for hitsound in self.hitsounds:
 			basename = hitsound.unwrap()
 			assert basename is not None
 			path = os.path.join(self.root, basename)
 			try:
-				hitsound_audio = AudioSegment.from_file(path)
-				self._hitsound_audios_temp[hitsound] = hitsound_audio
+				self._hitsound_infos_temp[hitsound] = probe_audio(path)
 			except Exception as e:
 				self.errors.add(hitsound, e)
 
 	def normalize_hitsounds(self) -> None:
-		config = Config.instance
-
-		for hitsound, hitsound_audio in self._hitsound_audios_temp.items():
+		for hitsound, info in self._hitsound_infos_temp.items():
 			dst_name = hitsound.unwrap()
 			assert dst_name is not None
 			try:
-				hitsound_audio.set_frame_rate(config.chartpack.hitsounds.sampling_rate)
 				dst = os.path.join(self.root, dst_name)
-				hitsound_audio.export(dst, format='wav')
+				HitsoundCache.normalize(dst, info)
 			except Exception as e:
 				self.errors.add(dst_name, e)
 
 	def free_hitsounds(self) -> None:
-		del self._hitsound_audios_temp
+		del self._hitsound_infos_temp
 	
 	################################################################################################################
 
 	def process_covers(self) -> None:
 		self.reset_covers()
-		self.find_covers()
-		self.load_covers()
-		self.normalize_covers()
-		self.free_covers()
+		try:
+			self.find_covers()
+			self.load_covers()
+			self.normalize_covers()
+		finally:
+			self.free_covers()
 	
 	def reset_covers(self) -> None:
 		self.covers_names: dict[ExtRtcls, list[str]] = {}
 		self._covers_temp: dict[ExtRtcls, Image.Image] = {}
+		self._covers_memory = MemoryBudget.reserve('曲绘')
 	
 	def find_covers(self) -> None:
 		config = Config.instance
@@ -476,48 +524,78 @@ class Chartpack:
 			self.errors.add(f'covers for diff {extcls.name}', PathNotFoundError(alternative_paths))
 	
 	def load_covers(self) -> None:
+		config = Config.instance
 		self._covers_temp: dict[ExtRtcls, Image.Image]
 
+		sizes: list[tuple[int, int]] = []
 		for extcls, cover_names in self.covers_names.items():
 			try:
 				best_src = pick_biggest_image(os.path.join(self.root, basename) for basename in cover_names)
+				sizes.append(ImageSizeIndex.get(best_src))
 				cover = Image.open(best_src)
 				self._covers_temp[extcls] = cover
 			except Exception as e:
 				self.errors.add(f'covers for diff {extcls.name}', 'No valid cover image found')
+		
+		# decoded sources are kept until freed; the RGB copy and two resized sizes only live while normalizing one cover
+		if sizes:
+			targets = [estimate_image_bytes(size) for size in config.chartpack.covers.normalize_to.values()]
+			self._covers_memory.acquire(
+				sum(estimate_image_bytes(size) for size in sizes) +
+				max(estimate_image_bytes(size) for size in sizes) +
+				2 * max(targets, default=0)
+			)
 
 
 	def normalize_covers(self) -> None:
 		config = Config.instance
-		
-		covers_names: dict[ExtRtcls, list[str]] = self.covers_names
+		norm_to = config.chartpack.covers.normalize_to
+
+		# biggest target first, so that each smaller size is resampled from the previous one rather than from the source
+		chain = sorted(norm_to.items(), key=lambda item: item[1][0] * item[1][1], reverse=True)
+		# targets of different aspect ratios may each be the biggest along one axis
+		draft_size = (max(w for w, _ in norm_to.values()), max(h for _, h in norm_to.values())) if norm_to else None
 
 		for extcls, cover in self._covers_temp.items():
-			names: list[str] = []
+			saved: set[str] = set()
+
+			try:
+				if draft_size is not None:
+					# for JPEG sources, let the decoder downscale by a power of 2 while staying above every target
+					cover.draft('RGB', draft_size)
+				source = cover.convert('RGB')
+			except Exception as e:
+				self.errors.add(f'covers for diff {extcls.name}', e)
+				continue
 
-			norm_to = config.chartpack.covers.normalize_to
-			for template, size in norm_to.items():
+			current = source
+			for template, size in chain:
 				basename = template.build(extcls.value)
 				dst = os.path.join(self.root, basename)
 				try:
-					cover_rgb = cover.convert('RGB')
-					cover_resized = cover_rgb.resize(size, Image.Resampling.LANCZOS)
-					cover_resized.save(dst, format='JPEG')
-					names.append(basename)
+					w, h = size
+					base = current if current.width >= w and current.height >= h else source
+					resized = base.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+					write_if_changed(dst, encode_image(resized, 'JPEG'))
+					ImageSizeIndex.record(dst, resized.size)
+					saved.add(basename)
 				except Exception as e:
 					self.errors.add(basename, e)
+					continue
+
+				if resized.width <= source.width and resized.height <= source.height:
+					current = resized
 			
+			names = [basename for template in norm_to if (basename := template.build(extcls.value)) in saved]
 			if not names:
 				self.errors.add(f'covers for diff {extcls.name}', 'No normalized cover image saved')
 				continue
-			covers_names[extcls] = names
-		
-		self.reset_covers()
-		self.covers_names = covers_names
-		self.load_covers()
+			self.covers_names[extcls] = names
 
 	def free_covers(self) -> None:
+		self._covers_memory.release()
 		del self._covers_temp
+		del self._covers_memory
 
 	################################################################################################################
 
@@ -530,9 +608,17 @@ class Chartpack:
 		self.clip_preview()
 		self.free_audios()
 	
+	def validate_audios(self) -> None:
+		# audio lengths are probed from container headers, so this is cheap enough to run without processing any asset
+		self.reset_audios()
+		self.find_audios()
+		self.load_audios()
+		self.check_audios()
+		self.free_audios()
+	
 	def reset_audios(self) -> None:
 		self.audio_names: dict[ExtRtcls, str] = {}
-		self._audios_temp: dict[ExtRtcls, AudioSegment] = {}
+		self._audio_infos_temp: dict[ExtRtcls, AudioInfo] = {}
 		self.preview_names: dict[ExtRtcls, str] = {}
 
 	def find_audios(self) -> None:
@@ -559,13 +645,13 @@ class Chartpack:
 			self.errors.add(basename, PathNotFoundError(path))
 	
 	def load_audios(self) -> None:
-		self._audios_temp: dict[ExtRtcls, AudioSegment]
+		self._audio_infos_temp: dict[ExtRtcls, AudioInfo]
 
+		# only stream parameters are probed here; audios are never decoded in memory
 		for extcls, basename in self.audio_names.items():
 			try:
 				audio_path = os.path.join(self.root, basename)
-				audio = AudioSegment.from_file(audio_path)
-				self._audios_temp[extcls] = audio
+				self._audio_infos_temp[extcls] = probe_audio(audio_path)
 			except Exception as e:
 				self.errors.add(basename, e)
 		
@@ -575,8 +661,8 @@ class Chartpack:
 		
 		config = Config.instance
 		minlen, maxlen = config.chartpack.audio.time_range
-		for rtcls, audio in self._audios_temp.items():
-			audio_len = len(audio)
+		for rtcls, info in self._audio_infos_temp.items():
+			audio_len = info.duration
 			if audio_len <= maxlen and audio_len >= minlen:
 				continue
 
@@ -590,12 +676,13 @@ class Chartpack:
 	def normalize_audios(self) -> None:
 		config = Config.instance
 
-		for extcls, audio in self._audios_temp.items():
+		for extcls, info in list(self._audio_infos_temp.items()):
 			basename = self.audio_names[extcls]
 			dst = os.path.join(self.root, basename)
 			try:
-				audio.set_frame_rate(config.chartpack.audio.sampling_rate)
-				audio.export(dst, format='ogg')
+				if conform_audio(dst, dst, 'ogg', ('vorbis',), config.chartpack.audio.sampling_rate, info):
+					# transcoding may change the length slightly, and previews are clipped from the transcoded file
+					self._audio_infos_temp[extcls] = probe_audio(dst)
 			except Exception as e:
 				basename = os.path.basename(dst)
 				self.errors.add(basename, e)
@@ -603,7 +690,15 @@ class Chartpack:
 	def clip_preview(self) -> None:
 		config = Config.instance
 
-		for extcls, audio in self._audios_temp.items():
+		fade_in = config.chartpack.audio.fade_in_duration
+		fade_out = config.chartpack.audio.fade_out_duration
+		sample_rate = config.chartpack.audio.sampling_rate
+
+		# previews cut from byte-identical audios share a single decoded buffer
+		groups: dict[str, tuple[str, int, dict[str, tuple[int, int]]]] = {}
+		dst_clses: dict[str, tuple[ExtRtcls, str]] = {}
+
+		for extcls, info in self._audio_infos_temp.items():
 			
 			dst_name = 'preview.ogg'
 			begin = self.songlist.audio_preview
@@ -621,43 +716,60 @@ class Chartpack:
 				except Exception as e:
 					self.errors.add(dst_name, e)
 			
-			if end > len(audio):
+			if end > info.duration:
 				self.errors.add(dst_name, f'Invalid \'audioPreviewEnd\': out of audio length range')
 			
 			dst = os.path.join(self.root, dst_name)
 
-			fade_in = config.chartpack.audio.fade_in_duration
-			fade_out = config.chartpack.audio.fade_out_duration
-
-			duration = len(audio)
+			duration = info.duration
 			clip_begin = max(begin - fade_in, 0)
 			clip_end = min(end + fade_out, duration)
-			
-			clip = audio[clip_begin : clip_end]
-			assert isinstance(clip, AudioSegment)
-			clip = clip.fade_in(fade_in).fade_out(fade_out)
 
+			src = os.path.join(self.root, self.audio_names[extcls])
 			try:
-				clip.export(dst, format='ogg')
-				self.preview_names[extcls] = dst_name
+				with open(src, 'rb') as f:
+					src_digest = hashlib.file_digest(f, 'sha1').hexdigest()
 			except Exception as e:
 				self.errors.add(dst_name, e)
+				continue
+
+			if src_digest not in groups:
+				groups[src_digest] = src, min(info.channels, 2) or 2, {}
+			groups[src_digest][2][dst] = clip_begin, clip_end
+			dst_clses[dst] = extcls, dst_name
+
+		for src, channels, clips in groups.values():
+			# the shared buffer, a faded copy of one clip and its encoded bytes are held at once
+			begin = min(begin for begin, _ in clips.values())
+			end = max(end for _, end in clips.values())
+			with MemoryBudget.reserve('音源') as memory:
+				memory.acquire(3 * estimate_pcm_bytes(end - begin, sample_rate, channels))
+				errors = render_previews(src, clips, 'ogg', sample_rate, channels, fade_in, fade_out)
+			for dst in clips:
+				extcls, dst_name = dst_clses[dst]
+				if dst in errors:
+					self.errors.add(dst_name, errors[dst])
+					continue
+				self.preview_names[extcls] = dst_name
 
 	def free_audios(self) -> None:
-		del self._audios_temp
+		del self._audio_infos_temp
 
 	################################################################################################################
 
 	def process_backgrounds(self) -> None:
 		self.reset_backgrounds()
-		self.find_backgrounds()
-		self.load_backgrounds()
-		self.normalize_backgrounds()
-		self.free_backgrounds()
+		try:
+			self.find_backgrounds()
+			self.load_backgrounds()
+			self.normalize_backgrounds()
+		finally:
+			self.free_backgrounds()
 	
 	def reset_backgrounds(self) -> None:
 		self.background_names: dict[str, str] = {}
 		self._backgrounds_temp: dict[str, Image.Image] = {}
+		self._backgrounds_memory = MemoryBudget.reserve('背景')
 	
 	def find_backgrounds(self) -> None:
 		self.background_names: dict[str, str]
@@ -684,13 +796,25 @@ class Chartpack:
 			self.errors.add(basename, PathNotFoundError(path))
 	
 	def load_backgrounds(self) -> None:
+		config = Config.instance
+
+		sizes: list[tuple[int, int]] = []
 		for bg, basename in self.background_names.items():
 			try:
 				path = os.path.join(self.root, basename)
+				sizes.append(ImageSizeIndex.get(path))
 				image = Image.open(path)
 				self._backgrounds_temp[bg] = image
 			except Exception as e:
 				self.errors.add(basename, e)
+		
+		# decoded sources are kept until freed; the RGB copy and the resized image only live while normalizing one background
+		if sizes:
+			self._backgrounds_memory.acquire(
+				sum(estimate_image_bytes(size) for size in sizes) +
+				max(estimate_image_bytes(size) for size in sizes) +
+				estimate_image_bytes(config.chartpack.bgs.size)
+			)
 	
 	def normalize_backgrounds(self) -> None:
 		config = Config.instance
@@ -702,12 +826,14 @@ class Chartpack:
 			try:
 				image_rgb = image.convert('RGB')
 				image_resized = image_rgb.resize(size, Image.Resampling.LANCZOS)
-				image_resized.save(path, format='JPEG')
+				write_if_changed(path, encode_image(image_resized, 'JPEG'))
 			except Exception as e:
 				self.errors.add(basename, e)
 	
 	def free_backgrounds(self) -> None:
+		self._backgrounds_memory.release()
 		del self._backgrounds_temp
+		del self._backgrounds_memory
 
 	################################################################################################################
 
@@ -721,3 +847,45 @@ class Chartpack:
 					self.errors.add(entry.name, e)
 
 	
+
+
+
+class ChartpackState:
+	"""
+	Picklable snapshot of a processed `Chartpack`, holding its metadata and asset names but no decoded assets.
+	- Used to send chartpacks across process boundaries; rebuild the chartpack with `to_chartpack()`.
+	"""
+	def __init__(self, chartpack: Chartpack) -> None:
+		self.root: str = chartpack.root
+		self.errors: MultipleExceptions = chartpack.errors
+		self.assets_processed: bool = chartpack.assets_processed
+
+		self.songlist_name: str = chartpack.songlist_name
+		self.songlist: SonglistItem = chartpack.songlist
+		self.event_info: EventInfoItem = chartpack.event_info
+
+		self.aff_names: dict[Rtcls, str] = chartpack.aff_names
+		self.hitsounds: set[HitsoundStr] = chartpack.hitsounds
+		self.audio_names: dict[ExtRtcls, str] = chartpack.audio_names
+		self.preview_names: dict[ExtRtcls, str] = chartpack.preview_names
+		self.covers_names: dict[ExtRtcls, list[str]] = chartpack.covers_names
+		self.background_names: dict[str, str] = chartpack.background_names
+	
+	def to_chartpack(self) -> Chartpack:
+		chartpack = Chartpack.__new__(Chartpack)
+		chartpack.root = self.root
+		chartpack._stage_local = threading.local()
+		chartpack.errors = self.errors
+		chartpack.assets_processed = self.assets_processed
+
+		chartpack.songlist_name = self.songlist_name
+		chartpack.songlist = self.songlist
+		chartpack.event_info = self.event_info
+
+		chartpack.aff_names = self.aff_names
+		chartpack.hitsounds = self.hitsounds
+		chartpack.audio_names = self.audio_names
+		chartpack.preview_names = self.preview_names
+		chartpack.covers_names = self.covers_names
+		chartpack.background_names = self.background_names
+		return chartpack
@@ -1,7 +1,10 @@
 import json
-from typing import Literal, Self
+import os
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Literal, NamedTuple, Self
 
-from pydantic import Field, NonNegativeInt as uint, PositiveFloat as posfloat, PositiveInt as posint, ValidationError, model_validator
+from pydantic import Field, NonNegativeInt as uint, PositiveFloat as posfloat, PositiveInt as posint, ValidationError, field_validator, model_validator
 
 from mortis import LowerAsciiId, RatingClassEnum, RatingInt, SideEnum, SingleLineStr
 from mortis.utils import classproperty
@@ -9,6 +12,7 @@ from mortis.utils import classproperty
 from iacta.logging import Logger
 from iacta.types.exceptions.config import ConfigNotFoundError, ImmutableError, InvalidConfigError
 from iacta.types.misc import DurationMs, ProjectBaseModel, TemplateStr
+from iacta.utils import is_subpath
 
 
 class PathsConfig(ProjectBaseModel):
@@ -20,8 +24,14 @@ class PathsConfig(ProjectBaseModel):
 	radio: str
 	chartpacks: str
 
+	cache: str | None = None
+
 	@model_validator(mode='after')
 	def _after_validation(self) -> Self:
+		# the root is emptied at the start of every run, which would silently drop a cache kept inside it
+		if self.cache is not None and is_subpath(self.cache, self.root):
+			raise ValueError(f'\'cache\' ({self.cache}) must not be inside \'root\' ({self.root})')
+
 		Logger.redirect_file(self.log_file)
 		return self
 
@@ -116,10 +126,57 @@ class ChartpackConfig(ProjectBaseModel):
 	songlist: SonglistPackConfig
 
 
+class CompressionRule(ProjectBaseModel):
+	method: Literal['stored', 'deflated', 'bzip2', 'lzma']
+	level: int | None = None
+
+	@model_validator(mode='after')
+	def _after_validation(self) -> Self:
+		if self.level is None:
+			return self
+		
+		ranges = {'deflated': (0, 9), 'bzip2': (1, 9)}
+		if self.method not in ranges:
+			raise ValueError(f'Method {self.method!r} takes no compression level')
+		minlevel, maxlevel = ranges[self.method]
+		if not minlevel <= self.level <= maxlevel:
+			raise ValueError(f'Compression level of {self.method!r} must be between {minlevel} and {maxlevel} (got {self.level})')
+		return self
+
+class CompressionConfig(ProjectBaseModel):
+	"""
+	Compression of session archive entries, by file extension (case-insensitive, with or without the dot;
+	an empty string matches files without an extension such as `songlist`).
+	"""
+	default: CompressionRule = CompressionRule(method='deflated')
+	by_extension: dict[str, CompressionRule] = {}
+
+	@field_validator('by_extension', mode='after')
+	@classmethod
+	def _normalize_extensions(cls, value: dict[str, CompressionRule]) -> dict[str, CompressionRule]:
+		return {ext.lower().removeprefix('.'): rule for ext, rule in value.items()}
+
+	def get_rule(self, filename: str) -> CompressionRule:
+		ext = os.path.splitext(filename)[1].lower().removeprefix('.')
+		return self.by_extension.get(ext, self.default)
+
+
 class TechnicalConfig(ProjectBaseModel):
 	digest_salts: tuple[str, ...]
 	file_edit_time: posint
 
+	workers: posint = 1
+	stage_workers: posint = 1
+
+	cache_max_size: posint = 4 * 1024 ** 3
+	memory_budget: posint | None = None
+
+	compression: CompressionConfig = CompressionConfig()
+
+	materialize: tuple[Literal['hardlink', 'reflink', 'copy_file_range', 'copy'], ...] = (
+		'hardlink', 'reflink', 'copy_file_range', 'copy'
+	)
+
 
 class PreparationConfig(ProjectBaseModel):
 	no_root_found: Literal['create', 'fail']
@@ -148,8 +205,47 @@ class _Config(ProjectBaseModel):
 	technical: TechnicalConfig
 
 
+class ValidationSnapshot(NamedTuple):
+	"""
+	Immutable view of the configurations read by songlist validators, precomputed once when configurations are loaded.
+	- Tuples of ratings are kept next to their frozensets so that error messages stay the same.
+	"""
+	fixed_fields: Mapping[str, Any]
+	sides: frozenset[SideEnum]
+
+	ratings: tuple[RatingInt, ...]
+	ratings_with_plus: tuple[RatingInt, ...]
+	rating_set: frozenset[RatingInt]
+	rating_with_plus_set: frozenset[RatingInt]
+
+	custom_string_max_lines: int
+	custom_string_max_line_length: int
+
+	do_digest_check: bool
+	digest_salts: tuple[str, ...]
+
+	@classmethod
+	def from_config(cls, config: '_Config') -> Self:
+		songlist = config.songlist
+		fixed_fields = songlist.fixed_fields
+		return cls(
+			fixed_fields=MappingProxyType({name: getattr(fixed_fields, name) for name in FixedFieldsConfig.model_fields}),
+			sides=frozenset(songlist.sides),
+			ratings=songlist.ratings,
+			ratings_with_plus=songlist.ratings_with_plus,
+			rating_set=frozenset(songlist.ratings),
+			rating_with_plus_set=frozenset(songlist.ratings_with_plus),
+			custom_string_max_lines=songlist.custom_string_max_lines,
+			custom_string_max_line_length=songlist.custom_string_max_line_length,
+			do_digest_check=songlist.do_digest_check,
+			digest_salts=config.technical.digest_salts,
+		)
+
+
 class Config:
 	__instance__ = None
+	__path__ = None
+	__snapshot__ = None
 
 	def __new__(cls) -> Self:
 		raise NotImplementedError
@@ -170,12 +266,35 @@ class Config:
 		except ValidationError as e:
 			raise InvalidConfigError(f'Errors occurred when validating configurations: \n{e}') from e
 
+		cls.__path__ = os.path.abspath(path)
+		cls.__snapshot__ = ValidationSnapshot.from_config(cls.__instance__)
 		return cls.__instance__
 	
+	@classproperty
+	@classmethod
+	def is_loaded(cls) -> bool:
+		return cls.__instance__ is not None
+	
+	@classproperty
+	@classmethod
+	def path(cls) -> str:
+		if cls.__path__ is not None:
+			return cls.__path__
+		
+		raise ConfigNotFoundError(f'No loaded configurations found')
+	
 	@classproperty
 	@classmethod
 	def instance(cls) -> _Config:
 		if cls.__instance__ is not None:
 			return cls.__instance__
 		
+		raise ConfigNotFoundError(f'No loaded configurations found')
+	
+	@classproperty
+	@classmethod
+	def snapshot(cls) -> ValidationSnapshot:
+		if cls.__snapshot__ is not None:
+			return cls.__snapshot__
+		
 		raise ConfigNotFoundError(f'No loaded configurations found')
\ No newline at end of file
@@ -6,6 +6,9 @@ class _PathError(OSError):
 	def __init__(self, path) -> None:
 		self.path = path
 	
+	def __reduce__(self):
+		return self.__class__, (self.path,)
+	
 	def __str__(self) -> str:
 		return f'Path error: {self.path}'
 
@@ -27,14 +30,21 @@ class MissingSonglistError(FileNotFoundError):
 	def __init__(self, folder: str) -> None:
 		self.folder = folder
 	
+	def __reduce__(self):
+		return self.__class__, (self.folder,)
+	
 	def __str__(self) -> str:
 		return f'No songlist file found in folder {self.folder}'
 
 class AmbiguousSonglistError(OSError):
-	def __init__(self, folder: str, entries: list[DirEntry[str]]) -> None:
+	def __init__(self, folder: str, entries: list[DirEntry[str]] | list[str]) -> None:
 		self.folder = folder
 		self.entries = entries
 	
+	def __reduce__(self):
+		# `DirEntry` objects cannot be pickled; their paths are enough for reporting
+		return self.__class__, (self.folder, [os.fspath(entry) for entry in self.entries])
+	
 	def __str__(self) -> str:
 		entries = ', '.join(os.path.basename(entry) for entry in self.entries)
 		return f'Too many songlist files found in folder {self.folder}: {entries}'
@@ -43,12 +53,18 @@ class AmbiguousSonglistError(OSError):
 class AudioLengthError(RuntimeError):
 	pass
 
+class FFmpegError(RuntimeError):
+	pass
+
 
 class BadChartpackError(OSError):
 	def __init__(self, path: str, e: Exception) -> None:
 		self.path = path
 		self.e = e
 	
+	def __reduce__(self):
+		return self.__class__, (self.path, self.e)
+	
 	def __str__(self) -> str:
 		return f'{self.path}: Bad chartpack; primary error is [{type(self.e).__name__}] {self.e}'
 	
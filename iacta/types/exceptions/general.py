@@ -1,5 +1,7 @@
+import pickle
 from typing import final
 
+from iacta.types.exceptions.file import BadChartpackError
 from iacta.utils import indent
 
 
@@ -41,8 +43,43 @@ class MultipleExceptions(ValueError):
 	def __repr__(self) -> str:
 		return f'MultipleExceptions({self.exceptions!r})'
 	
+	def __reduce__(self):
+		return self.__class__, (self.exceptions,)
+	
 	def add(self, k: str, e: str | Exception) -> None:
 		self.exceptions[k] = e
 	
 	def __bool__(self) -> bool:
-		return len(self.exceptions) != 0
\ No newline at end of file
+		return len(self.exceptions) != 0
+
+
+class WorkerError(RuntimeError):
+	"""
+	Stand-in for an exception raised in a worker process that could not be pickled back to the main process.
+	"""
+	def __init__(self, type_name: str, message: str) -> None:
+		self.type_name = type_name
+		self.message = message
+	
+	def __reduce__(self):
+		return self.__class__, (self.type_name, self.message)
+	
+	def __str__(self) -> str:
+		return f'[{self.type_name}] {self.message}'
+
+
+def ensure_picklable(e: Exception) -> Exception:
+	try:
+		pickle.dumps(e)
+		return e
+	except Exception:
+		pass
+
+	if isinstance(e, MultipleExceptions):
+		return MultipleExceptions({
+			k: v if isinstance(v, str) else ensure_picklable(v)
+			for k, v in e.exceptions.items()
+		})
+	if isinstance(e, BadChartpackError):
+		return BadChartpackError(e.path, ensure_picklable(e.e))
+	return WorkerError(type(e).__name__, str(e))
@@ -1,3 +1,4 @@
+from collections.abc import Iterable
 from enum import Enum
 from math import isfinite
 from typing import Any, Self, overload
@@ -59,6 +60,28 @@ class TemplateStr:
 		varset = set(vars)
 		self.is_simple = (len(varset) == 1 and vars[0] == '')
 		self.template = template
+
+		self._compile()
+	
+	def _compile(self) -> None:
+		"""
+		Precompute a `str.format` string with positional fields, so that building is a single `format` call.
+		- Fields use the `!s` conversion to keep `str(value)` semantics.
+		- `_var_order` is the order in which variables used to be checked, so that the missing variables are joined alike.
+		"""
+		unique_vars = list(dict.fromkeys(self.vars))
+		indices = {var: i for i, var in enumerate(unique_vars)}
+
+		def escape(seg: str) -> str:
+			return seg.replace('{', '{{').replace('}', '}}')
+
+		parts = [escape(self.segs[0])]
+		for var, seg in zip(self.vars, self.segs[1:]):
+			parts.append(f'{{{indices[var]}!s}}' + escape(seg))
+
+		self._format = ''.join(parts)
+		self._unique_vars = tuple(unique_vars)
+		self._var_order = tuple(reversed(self.vars))
 	
 	def _take_until(self, s: str, sep: str) -> tuple[str, str]:
 		segs = s.split(sep, 1)
@@ -74,26 +97,27 @@ class TemplateStr:
 		if self.is_simple:
 			if value is None:
 				raise ValueError(f'Missing variable')
-			return self.template.replace(r'{}', str(value))
-		
-		segs = self.segs.copy()
-		vars = self.vars.copy()
-		segs.reverse()
-		vars.reverse()
-
-		missing: set[str] = set()
+			return self._format.format(value)
 		
-		for var in vars:
-			if var not in kwargs:
-				missing.add(var)
-		if missing:
+		try:
+			return self._format.format(*[kwargs[var] for var in self._unique_vars])
+		except KeyError:
+			missing: set[str] = set()
+			for var in self._var_order:
+				if var not in kwargs:
+					missing.add(var)
+			if not missing:
+				raise
 			missing_str = ', '.join(missing)
-			raise ValueError(f'Missing variables: {missing_str}')
-		
-		strsegs = [segs.pop()]
-		while segs:
-			strsegs.append(str(kwargs[vars.pop()]) + segs.pop())
-		return ''.join(strsegs)
+			raise ValueError(f'Missing variables: {missing_str}') from None
+	
+	def build_many(self, values: Iterable[Any]) -> list[str]:
+		"""
+		Build the template for each of `values`: single values for simple templates, mappings of variables otherwise.
+		"""
+		if self.is_simple:
+			return [self.build(value) for value in values]
+		return [self.build(**value) for value in values]
 	
 	def __str__(self) -> str:
 		return self.template
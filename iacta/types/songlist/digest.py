@@ -1,33 +1,124 @@
+import sys
+from collections.abc import Sequence
+from functools import lru_cache
+from operator import mul
+
 from iacta.types.config import Config
+from iacta.utils import import_optional
 
 
-def get_digest(s: str) -> str:
-	def djb2(s: str):
-		hash_val = 5381
-		for char in s:
-			hash_val = ((hash_val << 5) + hash_val) + ord(char)
-			hash_val &= 0xFFFFFFFF
-		return format(hash_val, '08x')
-	
-	config = Config.instance
-	block_size = 1024
-	strlen = 32
-	salts = config.technical.digest_salts
+BLOCK_SIZE = 1024
+DIGEST_LENGTH = 32
+_MASK = 0xFFFFFFFF
+
+# importing NumPy costs more than hashing a few songlists in pure Python
+_NUMPY_MIN_CHARS = 1 << 18
+
+
+def djb2(s: str, hash_val: int = 5381) -> int:
+	for char in s:
+		hash_val = ((hash_val << 5) + hash_val) + ord(char)
+		hash_val &= 0xFFFFFFFF
+	return hash_val
+
+@lru_cache(maxsize=None)
+def _salt_hash(salt: str) -> int:
+	return djb2(salt)
+
+@lru_cache(maxsize=None)
+def _power(n: int) -> int:
+	return pow(33, n, 1 << 32)
+
+@lru_cache(maxsize=1)
+def _descending_powers() -> tuple[int, ...]:
+	"""
+	33 ** k mod 2 ** 32 for k from `BLOCK_SIZE - 1` down to 0.
+	"""
+	return tuple(_power(k) for k in range(BLOCK_SIZE - 1, -1, -1))
+
+@lru_cache(maxsize=1)
+def _descending_powers_array():
+	np = import_optional('numpy')
+	return np.array(_descending_powers(), dtype=np.uint64)
+
+def _get_numpy(total_chars: int):
+	"""
+	Return NumPy if it is already imported, or if it is installed and the input is large enough to make up for importing it.
+	"""
+	np = sys.modules.get('numpy')
+	if np is None and total_chars >= _NUMPY_MIN_CHARS:
+		np = import_optional('numpy')
+	return np
+
+
+# djb2 over `salt + block` unrolls to `djb2(salt) * 33 ** len(block) + sum(ord(c) * 33 ** (len(block) - 1 - i))` mod 2 ** 32,
+# so a block only contributes a weighted sum of its code points, which is computed without a per-character Python loop.
+
+def _block_sums_python(s: str) -> list[int]:
+	powers = _descending_powers()
+	sums: list[int] = []
+	for start in range(0, len(s), BLOCK_SIZE):
+		block = s[start:start + BLOCK_SIZE]
+		sums.append(sum(map(mul, map(ord, block), powers[BLOCK_SIZE - len(block):])) & _MASK)
+	return sums
 
+def _block_sums_numpy(strings: Sequence[str]) -> list[list[int]]:
+	"""
+	Compute the block sums of all strings at once: full blocks of every string are stacked into one matrix.
+	- Products and sums wrap around in uint64, which is harmless as only the result mod 2 ** 32 is kept.
+	"""
+	np = import_optional('numpy')
+	powers = _descending_powers_array()
+
+	full_blocks = []
+	tails = []
+	counts: list[int] = []
+	for s in strings:
+		codes = np.frombuffer(s.encode('utf-32-le', 'surrogatepass'), dtype='<u4').astype(np.uint64)
+		n_full = len(codes) // BLOCK_SIZE
+		full_blocks.append(codes[:n_full * BLOCK_SIZE].reshape(n_full, BLOCK_SIZE))
+		tails.append(codes[n_full * BLOCK_SIZE:])
+		counts.append(n_full)
+
+	full_sums = (np.concatenate(full_blocks) @ powers).tolist() if full_blocks else []
+
+	result: list[list[int]] = []
+	offset = 0
+	for n_full, tail in zip(counts, tails):
+		sums = [x & _MASK for x in full_sums[offset:offset + n_full]]
+		offset += n_full
+		if len(tail):
+			sums.append(int(tail @ powers[BLOCK_SIZE - len(tail):]) & _MASK)
+		result.append(sums)
+	return result
+
+
+def _finish(s: str, sums: list[int], salts: Sequence[str]) -> str:
 	parts = []
-	total_blocks = (len(s) + block_size - 1) // block_size
-	
-	for i in range(total_blocks):
-		start = i * block_size
-		end = start + block_size
-		block = s[start:end]
-		
-		data = salts[i % len(salts)] + block
-		hash = djb2(data)
-		parts.append(hash)
-	
+	for i, block_sum in enumerate(sums):
+		block_len = min(BLOCK_SIZE, len(s) - i * BLOCK_SIZE)
+		hash_val = (_salt_hash(salts[i % len(salts)]) * _power(block_len) + block_sum) & _MASK
+		parts.append(format(hash_val, '08x'))
+
 	checksum = ''.join(parts)
-	while len(checksum) < strlen:
-		checksum = checksum + djb2(checksum)
-	
-	return checksum[-strlen:]
\ No newline at end of file
+	while len(checksum) < DIGEST_LENGTH:
+		checksum = checksum + format(djb2(checksum), '08x')
+
+	return checksum[-DIGEST_LENGTH:]
+
+
+def compute_digests(strings: Sequence[str], salts: Sequence[str]) -> list[str]:
+	"""
+	Compute the digests of several strings with the given salts, vectorized across all of them if NumPy is worth using.
+	"""
+	if _get_numpy(sum(map(len, strings))) is not None:
+		all_sums = _block_sums_numpy(strings)
+	else:
+		all_sums = [_block_sums_python(s) for s in strings]
+	return [_finish(s, sums, salts) for s, sums in zip(strings, all_sums)]
+
+def compute_digest(s: str, salts: Sequence[str]) -> str:
+	return compute_digests([s], salts)[0]
+
+def get_digest(s: str) -> str:
+	return compute_digest(s, Config.snapshot.digest_salts)
@@ -1,14 +1,14 @@
 import json
-from typing import ClassVar, Self
+from typing import Any, ClassVar, Self
 
-from pydantic import Field, model_validator
+from pydantic import Field, ValidationInfo, model_validator
 from mortis import SonglistItem
 
 from iacta.types.config import Config
 from iacta.types.event_info import EventInfoItem
-from iacta.types.exceptions.general import MultipleExceptions
+from iacta.types.exceptions.general import MultipleExceptions, UnreachableBranch
 from iacta.types.songlist.digest import get_digest
-from iacta.types.songlist.types import CommentStr, DateTimestamp, PackStr, PurchaseStr, VersionStr, ensure_custom_str
+from iacta.types.songlist.types import CommentStr, DateTimestamp, PackStr, PurchaseStr, VersionStr, ensure_custom_str, get_snapshot
 from iacta.logging import dbglogger
 
 class SpSonglistItem(SonglistItem):
@@ -24,35 +24,40 @@ class SpSonglistItem(SonglistItem):
 
 	_unofficial_fields: ClassVar[tuple[str, ...]] = '_comment', 'just_kidding', 'event_info', 'digest'
 
+	# named apart from `SonglistItem._after_validation`, so that the checks of the base model still run before these
 	@model_validator(mode='after')
-	def _after_validation(self) -> Self:
-		config = Config.instance
+	def _sp_after_validation(self, info: ValidationInfo) -> Self:
+		snapshot = get_snapshot(info)
 
-		super()._after_validation
 		errors = MultipleExceptions()
 
 		for diff in self.difficulties.iter_difficulty():
 			name = diff.rating_class.name
 			try:
-				ensure_custom_str(diff.chart_designer)
+				ensure_custom_str(diff.chart_designer, snapshot)
 			except ValueError as e:
 				errors.add(name, e)
 			try:
-				ensure_custom_str(diff.jacket_designer)
+				ensure_custom_str(diff.jacket_designer, snapshot)
 			except ValueError as e:
 				errors.add(name, e)
 
 			if self.event_info.is_bonus:
 				continue
 				
-			rts = config.songlist.ratings_with_plus if diff.rating_plus else config.songlist.ratings
-			if diff.rating not in rts:
+			if diff.rating_plus:
+				rts, rt_set = snapshot.ratings_with_plus, snapshot.rating_with_plus_set
+			else:
+				rts, rt_set = snapshot.ratings, snapshot.rating_set
+			if diff.rating not in rt_set:
 				errors.add(name, ValueError(f'\'rating\' must be one of {rts} if \'ratingPlus\' is {diff.rating_plus}'))
 				
 		if errors:
 			raise errors
 		
-		if config.songlist.do_digest_check:
+		# validating with context `{'digest_check': False}` skips the check, e.g. to compute the digest of a new songlist
+		digest_check = (info.context or {}).get('digest_check', True)
+		if snapshot.do_digest_check and digest_check:
 			expected = self.get_digest()
 			if self.digest != expected:
 				dbglogger.error(f'Digest verification failed; should be {expected}')
@@ -61,14 +66,52 @@ class SpSonglistItem(SonglistItem):
 		return self
 	
 	def norm_songlist(self) -> SonglistItem:
-		data = self.to_dict()
-		for k in self.__class__._unofficial_fields:
-			if k in data:
-				del data[k]
-		return SonglistItem.model_validate(data)
+		"""
+		Project onto a plain `SonglistItem`, built from the already validated fields without validating them again
+		(the checks of `SonglistItem` have run when validating this item).
+		- Nested models are deep-copied, so that later changes to the projection (e.g. masking) never reach this item.
+		"""
+		fields = SonglistItem.model_fields.keys()
+		projection = SonglistItem.model_construct(
+			_fields_set=self.model_fields_set & fields,
+			**{name: getattr(self, name) for name in fields}
+		)
+		return projection.model_copy(deep=True)
 
-	def get_digest(self) -> str:
+	@classmethod
+	def validation_context(cls, **context: Any) -> dict[str, Any]:
+		"""
+		Return a validation context with the configuration snapshot resolved once, shared by all validators of a songlist.
+		"""
+		return {'snapshot': Config.snapshot, **context}
+
+	@classmethod
+	def strip_tail_comma(cls, raw: str) -> str:
+		"""
+		Strip a raw songlist file and handle its tail comma according to `songlist.tail_comma`.
+		"""
+		config = Config.instance
+
+		raw = raw.strip()
+		strat = config.songlist.tail_comma
+		if strat == 'allow':
+			if raw.endswith(','):
+				raw = raw[:-1]
+		elif strat == 'forbid':
+			pass
+		elif strat == 'require':
+			if not raw.endswith(','):
+				raise ValueError(f'Songlist must end with a comma')
+			raw = raw[:-1]
+		else:
+			raise UnreachableBranch
+		return raw
+
+	def get_digest_source(self) -> str:
+		# dumped on every call: fields may be assigned after validation
 		data = self.model_dump(by_alias=True)
 		del data['digest']
-		raw_str = json.dumps(data, indent=5, ensure_ascii=False)
-		return get_digest(raw_str)
\ No newline at end of file
+		return json.dumps(data, indent=5, ensure_ascii=False)
+
+	def get_digest(self) -> str:
+		return get_digest(self.get_digest_source())
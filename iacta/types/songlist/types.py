@@ -1,9 +1,9 @@
 from collections.abc import Callable
 from typing import Annotated, Any
 
-from pydantic import AfterValidator, NonNegativeInt
+from pydantic import AfterValidator, NonNegativeInt, ValidationInfo
 
-from iacta.types.config import Config
+from iacta.types.config import Config, ValidationSnapshot
 
 
 def ensure_no_newline(s: str) -> str:
@@ -13,9 +13,22 @@ def ensure_no_newline(s: str) -> str:
 SingleLineStr = Annotated[str, AfterValidator(ensure_no_newline)]
 
 
-def ensure_matches_config(s: Any, field: str) -> Any:
-	config = Config.instance
-	attr = getattr(config.songlist.fixed_fields, field)
+def get_snapshot(info: ValidationInfo | None = None) -> ValidationSnapshot:
+	"""
+	Return the snapshot resolved once for the whole validation (see `SpSonglistItem.validation_context`),
+	or the current one if validating without it.
+	"""
+	if info is not None and info.context is not None:
+		snapshot = info.context.get('snapshot')
+		if snapshot is not None:
+			return snapshot
+	return Config.snapshot
+
+
+def ensure_matches_config(s: Any, field: str, snapshot: ValidationSnapshot | None = None) -> Any:
+	if snapshot is None:
+		snapshot = Config.snapshot
+	attr = snapshot.fixed_fields[field]
 	if attr is None:
 		return s
 	
@@ -23,8 +36,8 @@ def ensure_matches_config(s: Any, field: str) -> Any:
 		raise ValueError(f'Value should be exactly {attr!r}')
 	return s
 
-def matches_config(field: str) -> Callable[[Any], Any]:
-	return lambda s: ensure_matches_config(s, field)
+def matches_config(field: str) -> Callable[[Any, ValidationInfo], Any]:
+	return lambda s, info: ensure_matches_config(s, field, get_snapshot(info))
 
 PackStr = Annotated[str, AfterValidator(matches_config('pack'))]
 PurchaseStr = Annotated[str, AfterValidator(matches_config('purchase'))]
@@ -34,10 +47,11 @@ VersionStr = Annotated[str, AfterValidator(matches_config('version'))]
 CommentStr = Annotated[str, AfterValidator(matches_config('comment'))]
 
 
-def ensure_custom_str(s: str) -> str:
-	config = Config.instance
-	max_lines = config.songlist.custom_string_max_lines
-	max_line_length = config.songlist.custom_string_max_line_length
+def ensure_custom_str(s: str, snapshot: ValidationSnapshot | None = None) -> str:
+	if snapshot is None:
+		snapshot = Config.snapshot
+	max_lines = snapshot.custom_string_max_lines
+	max_line_length = snapshot.custom_string_max_line_length
 
 	lines = s.split('\n')
 	if max_lines is not None and len(lines) > max_lines:
@@ -45,8 +59,11 @@ def ensure_custom_str(s: str) -> str:
 	
 	if max_line_length is not None:
 		for ln, line in enumerate(lines):
-			lenc = sum(1 if ch.isascii() else 2 for ch in line)
+			# every character counts at least 1, so short lines cannot exceed the limit
+			if len(line) * 2 <= max_line_length:
+				continue
+			lenc = len(line) if line.isascii() else sum(1 if ch.isascii() else 2 for ch in line)
 			if lenc > max_line_length:
 				raise ValueError(f'Line #{ln} exceeds the line length limitis of length ({max_line_length}, got {lenc})')
 	return s
-CustomStr = Annotated[str, AfterValidator(ensure_custom_str)]
\ No newline at end of file
+CustomStr = Annotated[str, AfterValidator(lambda s, info: ensure_custom_str(s, get_snapshot(info)))]
\ No newline at end of file
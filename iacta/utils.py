@@ -1,9 +1,19 @@
+import hashlib
+import importlib
+import io
+import os
 import random
+import struct
+import threading
 from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import cache
 from math import ceil
-from typing import Any, Generic, TypeVar
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, BinaryIO, Generic, TypeVar
 
-from PIL import Image
+if TYPE_CHECKING:
+	from PIL import Image
 
 
 MT = TypeVar('MT', bound=Any)
@@ -59,6 +69,93 @@ def random_distribute(arr: list[T], n: int) -> list[list[T]]:
 	return distributed
 
 
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_JPEG_SOF_MARKERS = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+_JPEG_STANDALONE_MARKERS = frozenset((0x01, *range(0xD0, 0xD9)))
+
+def _probe_png_size(f: BinaryIO) -> tuple[int, int] | None:
+	header = f.read(24)
+	if len(header) < 24 or header[:8] != _PNG_SIGNATURE or header[12:16] != b'IHDR':
+		return None
+	w, h = struct.unpack('>II', header[16:24])
+	return w, h
+
+def _probe_jpeg_size(f: BinaryIO) -> tuple[int, int] | None:
+	if f.read(2) != b'\xff\xd8':
+		return None
+	
+	while True:
+		byte = f.read(1)
+		if byte != b'\xff':
+			return None
+		while byte == b'\xff':
+			byte = f.read(1)
+		if not byte:
+			return None
+		
+		marker = byte[0]
+		if marker in _JPEG_STANDALONE_MARKERS:
+			continue
+		if marker == 0xDA:
+			# start of scan reached without any frame header
+			return None
+
+		segment_len = f.read(2)
+		if len(segment_len) < 2:
+			return None
+		(length,) = struct.unpack('>H', segment_len)
+
+		if marker in _JPEG_SOF_MARKERS:
+			frame = f.read(5)
+			if len(frame) < 5:
+				return None
+			h, w = struct.unpack('>xHH', frame)
+			return w, h
+		f.seek(length - 2, os.SEEK_CUR)
+
+def probe_image_size(path: str) -> tuple[int, int]:
+	"""
+	Get the size of an image by reading only its JPEG SOF / PNG IHDR header.
+	- Other formats (or malformed headers) fall back to Pillow.
+	"""
+	with open(path, 'rb') as f:
+		size = _probe_png_size(f)
+		if size is None:
+			f.seek(0)
+			size = _probe_jpeg_size(f)
+	if size is not None:
+		return size
+	
+	from PIL import Image
+	with Image.open(path) as img:
+		return img.size
+
+
+class ImageSizeIndex:
+	"""
+	Per-run index of image sizes, keyed by (path, mtime, file size) so that rewritten files are probed again.
+	"""
+	_sizes: dict[tuple[str, int, int], tuple[int, int]] = {}
+
+	@classmethod
+	def _key(cls, path: str) -> tuple[str, int, int]:
+		st = os.stat(path)
+		return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+	@classmethod
+	def get(cls, path: str) -> tuple[int, int]:
+		key = cls._key(path)
+		size = cls._sizes.get(key)
+		if size is None:
+			size = probe_image_size(path)
+			cls._sizes[key] = size
+		return size
+	
+	@classmethod
+	def record(cls, path: str, size: tuple[int, int]) -> None:
+		cls._sizes[cls._key(path)] = size
+
+
 def pick_biggest_image(image_paths: Iterable[str]) -> str:
 	image_paths = list(image_paths)
 	if not image_paths:
@@ -67,17 +164,157 @@ def pick_biggest_image(image_paths: Iterable[str]) -> str:
 	best_path = None
 	max_area = 0
 	for path in image_paths:
-		with Image.open(path) as img:
-			w, h = img.size
-			area = w * h
-			if area > max_area:
-				max_area = area
-				best_path = path
+		w, h = ImageSizeIndex.get(path)
+		area = w * h
+		if area > max_area:
+			max_area = area
+			best_path = path
 	
 	assert best_path is not None
 	return best_path
 
 
+def run_dag(
+	tasks: dict[str, tuple[Callable[[], Any], Iterable[str]]],
+	workers: int = 1,
+	on_done: Callable[[str], Any] | None = None
+) -> None:
+	"""
+	Run `tasks` (name -> (function, dependency names)) in a thread pool, starting each task once all its dependencies are done.
+	- Tasks depending on a failed task are skipped.
+	- After all started tasks finish, the exception of the first failed task (in declaration order) is re-raised.
+	"""
+	pending = {name: (func, tuple(deps)) for name, (func, deps) in tasks.items()}
+	for name, (_, deps) in pending.items():
+		for dep in deps:
+			if dep not in pending:
+				raise ValueError(f'Task {name!r} depends on unknown task {dep!r}')
+
+	done: set[str] = set()
+	blocked: set[str] = set()
+	failed: dict[str, BaseException] = {}
+	running: dict[Future, str] = {}
+
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		while pending or running:
+			for name, (func, deps) in list(pending.items()):
+				if any(dep in blocked for dep in deps):
+					blocked.add(name)
+					del pending[name]
+				elif all(dep in done for dep in deps):
+					running[executor.submit(func)] = name
+					del pending[name]
+
+			if not running:
+				if pending:
+					raise ValueError(f'Cyclic dependencies among tasks: {", ".join(pending)}')
+				break
+
+			finished, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in finished:
+				name = running.pop(future)
+				e = future.exception()
+				if e is not None:
+					failed[name] = e
+					blocked.add(name)
+					continue
+
+				done.add(name)
+				if on_done is not None:
+					on_done(name)
+
+	for name in tasks:
+		if name in failed:
+			raise failed[name]
+
+
+def is_subpath(path: str, parent: str) -> bool:
+	"""
+	Whether `path` is `parent` itself or lies inside it, once both are made absolute.
+	"""
+	path, parent = os.path.abspath(path), os.path.abspath(parent)
+	try:
+		return os.path.commonpath([path, parent]) == parent
+	except ValueError:
+		# on different drives
+		return False
+
+def temp_sibling(path: str) -> str:
+	"""
+	Get a temporary path next to `path` (keeping its extension), unique to the current process and thread.
+	"""
+	root, ext = os.path.splitext(path)
+	return f'{root}.tmp-{os.getpid()}-{threading.get_ident()}{ext}'
+
+def _file_digest(path: str) -> bytes:
+	with open(path, 'rb') as f:
+		return hashlib.file_digest(f, 'sha256').digest()
+
+def replace_if_changed(tmp: str, dst: str) -> bool:
+	"""
+	Move `tmp` over `dst` unless `dst` already has the same content (compared by length, then by hash).
+	- `tmp` is consumed either way. Return whether `dst` was written.
+	"""
+	try:
+		if os.path.getsize(tmp) == os.path.getsize(dst) and _file_digest(tmp) == _file_digest(dst):
+			os.remove(tmp)
+			return False
+	except FileNotFoundError:
+		pass
+	os.replace(tmp, dst)
+	return True
+
+def write_if_changed(dst: str, data: bytes) -> bool:
+	"""
+	Atomically write `data` to `dst` unless it already has the same content. Return whether `dst` was written.
+	"""
+	try:
+		if os.path.getsize(dst) == len(data) and _file_digest(dst) == hashlib.sha256(data).digest():
+			return False
+	except FileNotFoundError:
+		pass
+
+	tmp = temp_sibling(dst)
+	try:
+		with open(tmp, 'wb') as f:
+			f.write(data)
+		os.replace(tmp, dst)
+	finally:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+	return True
+
+def dump_if_changed(dst: str, dump: Callable[[str], Any]) -> bool:
+	"""
+	Let `dump(path)` write into a temporary sibling of `dst`, and keep the result only if it differs from `dst`.
+	- For serializers that can only write to a path. Return whether `dst` was written.
+	"""
+	tmp = temp_sibling(dst)
+	try:
+		dump(tmp)
+		return replace_if_changed(tmp, dst)
+	finally:
+		if os.path.exists(tmp):
+			os.remove(tmp)
+
+
+def encode_image(image: 'Image.Image', format: str) -> bytes:
+	buffer = io.BytesIO()
+	image.save(buffer, format=format)
+	return buffer.getvalue()
+
+
+@cache
+def import_optional(name: str) -> ModuleType | None:
+	"""
+	Import an optional dependency at first use, or return `None` if it is not installed.
+	"""
+	try:
+		return importlib.import_module(name)
+	except ImportError:
+		return None
+
+
 def truncate(s: str, maxlen: int) -> str:
 	if maxlen <= 3:
 		raise NotImplementedError
@@ -0,0 +1,14 @@
+from iacta.memory import MemoryBudget
+from iacta.types.chartpack import Chartpack
+from iacta.types.config import Config
+
+
+def init_worker(config_path: str) -> None:
+	"""
+	Initializer of the worker processes of every step: load the configurations of the main process,
+	hide per-chartpack progress bars and split the memory budget among the workers.
+	"""
+	if not Config.is_loaded:
+		Config.load_from(config_path)
+	Chartpack.show_progress = False
+	MemoryBudget.share = Config.instance.technical.workers
@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+
+from iacta.types.config import Config
+
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(__file__), os.pardir, 'example', 'config-example.json')
+
+
+@pytest.fixture(scope='module', autouse=True)
+def config(tmp_path_factory: pytest.TempPathFactory) -> None:
+	if Config.is_loaded:
+		return
+
+	tmp = tmp_path_factory.mktemp('iacta')
+	with open(EXAMPLE_CONFIG, 'r', encoding='utf-8') as f:
+		cfg = json.load(f)
+	cfg['paths'] = {name: str(tmp / name) for name in cfg['paths']}
+
+	path = tmp / 'config.json'
+	path.write_text(json.dumps(cfg), encoding='utf-8')
+	Config.load_from(path)
+
+
+def make_songlist(**overrides: Any) -> dict[str, Any]:
+	fixed_fields = Config.instance.songlist.fixed_fields
+	data = {
+		'id': 'testsong',
+		'title_localized': {'en': 'Test Song'},
+		'artist': 'Artist',
+		'bpm': '200',
+		'bpm_base': 200,
+		'set': fixed_fields.pack,
+		'purchase': fixed_fields.purchase,
+		'side': 1,
+		'bg': 'base_conflict',
+		'date': fixed_fields.date,
+		'version': fixed_fields.version,
+		'audioPreview': 10000,
+		'audioPreviewEnd': 20000,
+		'difficulties': [
+			{'ratingClass': rtcls, 'chartDesigner': 'Charter', 'jacketDesigner': 'Painter', 'rating': 8 + rtcls}
+			for rtcls in range(3)
+		],
+		'_comment': fixed_fields.comment,
+		'just_kidding': False,
+		'event_info': {'is_bonus': False, 'charters': ['Charter']},
+		'digest': '',
+	}
+	data.update(overrides)
+	return data
+
+
+def validate(data: dict[str, Any]):
+	from iacta.types.songlist.extmodel import SpSonglistItem
+	return SpSonglistItem.model_validate(data, context=SpSonglistItem.validation_context(digest_check=False))
+
+
+def test_accepts_valid_songlist() -> None:
+	songlist = validate(make_songlist())
+	assert songlist.norm_songlist().to_dict()['id'] == 'testsong'
+
+
+@pytest.mark.parametrize('overrides', [
+	pytest.param({'audioPreview': 20001}, id='preview begins after its end'),
+	pytest.param({'artist_localized': {'en': 'Artist'}}, id='both artist and artist_localized'),
+	pytest.param({'bg': 'base_light'}, id='official bg of another side'),
+])
+def test_rejects_base_songlist_errors(overrides: dict[str, Any]) -> None:
+	with pytest.raises(ValidationError):
+		validate(make_songlist(**overrides))